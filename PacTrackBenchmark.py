@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#                           PacTrack Benchmarks                              #
+#         Offline timing of PacTrack against synthetic repositories          #
+##############################################################################
+
+
+import sys
+import os.path
+import argparse
+import contextlib
+import http.server
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import PackTrackCore
+
+# ----------------------------------------------------------------------------
+
+BENCHMARKS=["processDescDatabase", "processDatabaseArchive.cold", "processDatabaseArchive.warm", "processGroups.new", "processGroups.unchanged", "processGroups.incremental", "readGroups", "groupsStore.read", "groupsStore.write", "processDatabase.cold", "processDatabase.warm", "processDatabase.unchanged", "publish.none", "publish.gzip", "publish.zstd", "startup.interpreter", "startup.download"]
+WORDS=["library", "tool", "for", "the", "and", "support", "data", "fast", "network", "graphical", "utilities", "bindings", "python", "files", "system"]
+
+# ----------------------------------------------------------------------------
+
+def generateDesc(pPackageName, pPackages, pGroups, pOptions, pRandom):
+	"""
+	Generate a synthetic sync database desc entry
+	Arguments:
+		pPackageName	--	the package to generate an entry for
+		pPackages			--	all package names, to pick dependencies from
+		pGroups				--	the groups that the package belongs to
+		pOptions			--	benchmark options
+		pRandom				--	random number generator
+	Returns the desc contents
+	"""
+	description = ""
+	while len(description) < pOptions.desc_size:
+		description += pRandom.choice(WORDS)+" "
+	contents = "%FILENAME%\n"+pPackageName+"-1.0-1-x86_64.pkg.tar.zst\n\n"
+	contents += "%NAME%\n"+pPackageName+"\n\n"
+	contents += "%BASE%\n"+pPackageName+"\n\n"
+	contents += "%VERSION%\n1.0-1\n\n"
+	contents += "%DESC%\n"+description.strip()+"\n\n"
+	contents += "%CSIZE%\n"+str(pRandom.randint(1000, 10000000))+"\n\n"
+	contents += "%SHA256SUM%\n"+"%064x" % pRandom.getrandbits(256)+"\n\n"
+	if len(pGroups) > 0:
+		contents += "%GROUPS%\n"+"\n".join(pGroups)+"\n\n"
+	contents += "%ARCH%\nx86_64\n\n"
+	contents += "%DEPENDS%\n"+"\n".join(pRandom.sample(pPackages, min(4, len(pPackages))))+"\n\n"
+	contents += "%OPTDEPENDS%\n"+"\n".join([optPackage+": optional support" for optPackage in pRandom.sample(pPackages, min(2, len(pPackages)))])+"\n\n"
+	return contents
+
+# ----------------------------------------------------------------------------
+
+def generateRepository(pFilename, pOptions, pRandom):
+	"""
+	Generate a synthetic sync database archive
+	Arguments:
+		pFilename	--	the archive to create
+		pOptions	--	benchmark options
+		pRandom		--	random number generator
+	Returns the names of the packages in the repository
+	"""
+	packages = ["pkg"+str(index) for index in range(pOptions.packages)]
+	groups = ["group"+str(index) for index in range(pOptions.groups)]
+	mode = "w" if pOptions.compression == "none" else "w:"+pOptions.compression
+	archive = tarfile.open(pFilename, mode, format=tarfile.GNU_FORMAT)
+	for packageName in packages:
+		packageGroups = []
+		if len(groups) > 0 and pRandom.random() < pOptions.group_ratio:
+			packageGroups = sorted(pRandom.sample(groups, min(pOptions.fanout, len(groups))))
+		contents = generateDesc(packageName, packages, packageGroups, pOptions, pRandom).encode("utf-8")
+		member = tarfile.TarInfo(packageName+"-1.0-1")
+		member.type = tarfile.DIRTYPE
+		member.mode = 0o755
+		archive.addfile(member)
+		member = tarfile.TarInfo(packageName+"-1.0-1/desc")
+		member.size = len(contents)
+		member.mode = 0o644
+		archive.addfile(member, io.BytesIO(contents))
+	archive.close()
+	return packages
+
+# ----------------------------------------------------------------------------
+
+def generateDependencyMods(pPath, pPackages, pOptions, pRandom):
+	"""
+	Generate dependency modification files for a share of the packages
+	Arguments:
+		pPath			--	the dependencymods directory
+		pPackages	--	all package names
+		pOptions	--	benchmark options
+		pRandom		--	random number generator
+	"""
+	os.makedirs(pPath, exist_ok=True)
+	for packageName in pPackages:
+		if pRandom.random() < pOptions.mods_density:
+			modsFile = open(pPath+"/"+packageName, "w")
+			modsFile.write("+"+pRandom.choice(pPackages)+"\n-"+pRandom.choice(pPackages)+"\n")
+			modsFile.close()
+	for groupIndex in range(pOptions.groups):
+		if pRandom.random() < pOptions.mods_density:
+			modsFile = open(pPath+"/meta-group"+str(groupIndex), "w")
+			modsFile.write("+"+pRandom.choice(pPackages)+"\n")
+			modsFile.close()
+
+# ----------------------------------------------------------------------------
+
+def stubRunCommand(pCommand, pCwd, pQuiet):
+	"""
+	Stand-in for PackTrackCore.runCommand that replaces makepkg with the native
+	builder and runs any other command for real
+	Arguments:
+		pCommand	--	the command line to run
+		pCwd			--	the working directory, or None for the current directory
+		pQuiet		--	whether to supress output
+	Returns true if the command succeeded
+	"""
+	if "makepkg" in pCommand:
+		pkgbuild = {}
+		for line in open(pCwd+"/PKGBUILD", "r"):
+			if "=" in line:
+				pkgbuild[line.split("=", 1)[0]] = line.split("=", 1)[1].strip()
+		dependencies = [dependency.strip("'") for dependency in pkgbuild["depends"].strip("()").split()]
+		return PackTrackCore.createMetaPackage(pCwd, pkgbuild["pkgname"], pkgbuild["pkgver"], pkgbuild["pkgname"][5:], dependencies)
+	return realRunCommand(pCommand, pCwd, pQuiet)
+
+realRunCommand = PackTrackCore.runCommand
+
+# ----------------------------------------------------------------------------
+
+def stubDownloadFile(pURL, pOutputFile, pQuiet, pValidators):
+	"""
+	Stand-in for PackTrackCore.downloadFile that copies file:// URLs
+	"""
+	if pValidators is not None:
+		pValidators.clear()
+	return PackTrackCore.copyFile(pURL[len("file://"):], pOutputFile)
+
+# ----------------------------------------------------------------------------
+
+def configurePacTrack(pRoot):
+	"""
+	Point every PacTrack location at a scratch directory
+	Arguments:
+		pRoot	--	the scratch directory
+	"""
+	PackTrackCore.PACTRACK_ETC_DIR = pRoot+"/etc"
+	PackTrackCore.PACTRACK_LIB_DIR = pRoot+"/lib"
+	PackTrackCore.PACMAN_LIB_DIR = pRoot+"/pacman"
+	PackTrackCore.META_REPOSITORY = pRoot+"/"+PackTrackCore.META_REPOSITORY_NAME
+	PackTrackCore.TEMP_DIR = pRoot+"/tmp"
+	PackTrackCore.DEBUG = False
+	PackTrackCore.importDatabaseModules()
+
+# ----------------------------------------------------------------------------
+
+def resetDirectories(pPaths):
+	"""
+	Remove and re-create a list of directories
+	"""
+	for path in pPaths:
+		shutil.rmtree(path, ignore_errors=True)
+		os.makedirs(path)
+
+# ----------------------------------------------------------------------------
+
+def timeBenchmark(pName, pRepeat, pSetup, pRun, pResults):
+	"""
+	Time a benchmark, running its (untimed) setup before every run
+	Arguments:
+		pName						--	the benchmark name
+		pRepeat					--	number of timed runs
+		pSetup					--	callable preparing a run, or None
+		pRun						--	callable performing the run, returning true on success
+		pResults	(out)	--	results by benchmark name
+	"""
+	timings = []
+	failures = 0
+	for run in range(pRepeat):
+		if pSetup is not None:
+			pSetup()
+		startTime = time.perf_counter()
+		if not pRun():
+			failures += 1
+		timings.append(time.perf_counter()-startTime)
+	pResults[pName] = {"runs": timings, "min": min(timings), "median": statistics.median(timings), "mean": statistics.mean(timings), "failures": failures}
+	print("Benchmark '"+pName+"': median "+"%.4f" % pResults[pName]["median"]+"s", file=sys.stderr)
+
+# ----------------------------------------------------------------------------
+
+def startHTTPServer(pDirectory):
+	"""
+	Serve a directory over HTTP on localhost from a background thread
+	Arguments:
+		pDirectory	--	the directory to serve
+	Returns the server
+	"""
+	class QuietHandler(http.server.SimpleHTTPRequestHandler):
+		def __init__(self, *args, **kwargs):
+			super().__init__(*args, directory=pDirectory, **kwargs)
+		def log_message(self, *args):
+			pass
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+# ----------------------------------------------------------------------------
+
+def runBenchmarks(pRoot, pOptions, pResults):
+	"""
+	Generate a synthetic repository and run the selected benchmarks against it
+	Arguments:
+		pRoot						--	scratch directory
+		pOptions				--	benchmark options
+		pResults	(out)	--	results by benchmark name
+	"""
+	randomGenerator = random.Random(pOptions.seed)
+	configurePacTrack(pRoot)
+	if pOptions.stub_tools:
+		PackTrackCore.runCommand = stubRunCommand
+	PackTrackCore.DATABASE_WORKERS = pOptions.workers
+	for path in [PackTrackCore.PACTRACK_LIB_DIR, PackTrackCore.META_REPOSITORY, PackTrackCore.TEMP_DIR, pRoot+"/upstream", pRoot+"/sync"]:
+		os.makedirs(path, exist_ok=True)
+	databaseFile = pRoot+"/upstream/bench.db"
+	packages = generateRepository(databaseFile, pOptions, randomGenerator)
+	generateDependencyMods(PackTrackCore.PACTRACK_ETC_DIR+"/dependencymods", packages, pOptions, randomGenerator)
+	selected = BENCHMARKS if pOptions.benchmarks is None else pOptions.benchmarks.split(",")
+
+	# Group list shared by the group benchmarks
+	groupList = {}
+	PackTrackCore.processDatabaseArchive(databaseFile, PackTrackCore.TEMP_DIR+"/groups.tar", groupList, None, set())
+
+	def resetRun():
+		PackTrackCore.dependencyModsIndex = None
+
+	def copyGroupList():
+		return dict([(groupName, set(groupList[groupName])) for groupName in groupList])
+
+	def processGroups(pChangedPackages):
+		# Metapackages are built once the changes are recorded, as at the end 
+		# of a sync
+		return PackTrackCore.processGroups("bench", copyGroupList(), pChangedPackages) and PackTrackCore.buildPendingGroups([])
+
+	if "processDescDatabase" in selected:
+		def setup():
+			resetRun()
+			resetDirectories([PackTrackCore.TEMP_DIR+"/database"])
+			archive = tarfile.open(databaseFile)
+			archive.extractall(PackTrackCore.TEMP_DIR+"/database")
+			archive.close()
+		timeBenchmark("processDescDatabase", pOptions.repeat, setup, lambda: PackTrackCore.processDescDatabase(PackTrackCore.TEMP_DIR+"/database", {}, None, set()), pResults)
+
+	if "processDatabaseArchive.cold" in selected:
+		timeBenchmark("processDatabaseArchive.cold", pOptions.repeat, resetRun, lambda: PackTrackCore.processDatabaseArchive(databaseFile, PackTrackCore.TEMP_DIR+"/processed.tar", {}, {}, set()), pResults)
+
+	if "processDatabaseArchive.warm" in selected:
+		warmCache = {}
+		PackTrackCore.processDatabaseArchive(databaseFile, PackTrackCore.TEMP_DIR+"/processed.tar", {}, warmCache, set())
+		runCache = {}
+		def setup():
+			resetRun()
+			runCache.clear()
+			runCache.update(json.loads(json.dumps(warmCache)))
+		timeBenchmark("processDatabaseArchive.warm", pOptions.repeat, setup, lambda: PackTrackCore.processDatabaseArchive(databaseFile, PackTrackCore.TEMP_DIR+"/processed.tar", {}, runCache, set()), pResults)
+
+	def resetGroups():
+		resetRun()
+		resetDirectories([PackTrackCore.PACTRACK_LIB_DIR, PackTrackCore.META_REPOSITORY, PackTrackCore.TEMP_DIR+"/build"])
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		if "processGroups.new" in selected:
+			timeBenchmark("processGroups.new", pOptions.repeat, resetGroups, lambda: processGroups(None), pResults)
+
+		if "processGroups.unchanged" in selected:
+			def setup():
+				resetRun()
+				resetDirectories([PackTrackCore.TEMP_DIR+"/build"])
+			resetGroups()
+			processGroups(None)
+			timeBenchmark("processGroups.unchanged", pOptions.repeat, setup, lambda: processGroups(None), pResults)
+
+		if "processGroups.incremental" in selected:
+			# One package changed since the groups were processed
+			def setup():
+				resetRun()
+				resetDirectories([PackTrackCore.TEMP_DIR+"/build"])
+			changedPackages = set()
+			for groupName in groupList:
+				changedPackages.add(sorted(groupList[groupName])[0])
+				break
+			resetGroups()
+			processGroups(None)
+			timeBenchmark("processGroups.incremental", pOptions.repeat, setup, lambda: processGroups(changedPackages), pResults)
+
+	if "readGroups" in selected:
+		# The groups.db text format, as read by the importer
+		contents = ""
+		for groupName in groupList:
+			contents += "G:1:"+groupName+"\n"
+			for packageName in groupList[groupName]:
+				contents += "D:bench:"+packageName+"\n"
+		groupsFile = open(pRoot+"/groups.db", "w")
+		groupsFile.write(contents)
+		groupsFile.close()
+		timeBenchmark("readGroups", pOptions.repeat, None, lambda: PackTrackCore.readGroups(pRoot+"/groups.db", {}, {}), pResults)
+
+	if "groupsStore.write" in selected or "groupsStore.read" in selected:
+		store = {}
+		def setup():
+			resetGroups()
+			store["store"] = PackTrackCore.openGroupsStore()
+		def run():
+			returnCode = PackTrackCore.writeGroupChanges(store["store"], "bench", copyGroupList(), {})
+			store["store"].close()
+			return returnCode
+		timeBenchmark("groupsStore.write", pOptions.repeat, setup, run, pResults)
+		def run():
+			store["store"] = PackTrackCore.openGroupsStore()
+			returnCode = PackTrackCore.readRepositoryGroupDigests(store["store"], "bench", {})
+			store["store"].close()
+			return returnCode
+		timeBenchmark("groupsStore.read", pOptions.repeat, None, run, pResults)
+
+	if "processDatabase.cold" in selected or "processDatabase.warm" in selected or "processDatabase.unchanged" in selected:
+		server = None
+		if pOptions.source == "http":
+			server = startHTTPServer(pRoot+"/upstream")
+			databaseURL = "http://127.0.0.1:"+str(server.server_address[1])+"/bench.db"
+		else:
+			PackTrackCore.downloadFile = stubDownloadFile
+			databaseURL = "file://"+databaseFile
+		def processDatabase(pURL):
+			return PackTrackCore.processDatabase(pURL, pRoot+"/sync/bench.db") and PackTrackCore.buildPendingGroups([])
+		with contextlib.redirect_stdout(io.StringIO()):
+			if "processDatabase.cold" in selected:
+				timeBenchmark("processDatabase.cold", pOptions.repeat, resetGroups, lambda: processDatabase(databaseURL), pResults)
+			if "processDatabase.warm" in selected:
+				# Description cache filled, but the database processed again
+				def setup():
+					resetRun()
+					shutil.rmtree(PackTrackCore.PACTRACK_LIB_DIR+"/repositories", ignore_errors=True)
+				resetGroups()
+				processDatabase(databaseURL)
+				timeBenchmark("processDatabase.warm", pOptions.repeat, setup, lambda: processDatabase(databaseURL), pResults)
+			if "processDatabase.unchanged" in selected:
+				# Upstream unchanged since the last run (not modified over HTTP)
+				resetGroups()
+				processDatabase(databaseURL)
+				timeBenchmark("processDatabase.unchanged", pOptions.repeat, resetRun, lambda: processDatabase(databaseURL), pResults)
+		if server is not None:
+			server.shutdown()
+
+	# Compressing and publishing the processed database, with the output size
+	processedFile = PackTrackCore.TEMP_DIR+"/publish.tar"
+	PackTrackCore.processDatabaseArchive(databaseFile, processedFile, {}, None, set())
+	for compression in ["none", "gzip", "zstd"]:
+		if "publish."+compression in selected:
+			def run():
+				compressedFile = []
+				PackTrackCore.DATABASE_COMPRESSION = compression
+				return PackTrackCore.compressDatabase(processedFile, compressedFile) and PackTrackCore.publishFile(compressedFile[0], pRoot+"/sync/bench.db")
+			timeBenchmark("publish."+compression, pOptions.repeat, None, run, pResults)
+			pResults["publish."+compression]["size"] = os.path.getsize(pRoot+"/sync/bench.db")
+	PackTrackCore.DATABASE_COMPRESSION = "none"
+
+	if "startup.interpreter" in selected or "startup.download" in selected:
+		# Plain package downloads as pacman runs them, in a new interpreter each 
+		# time (forwarded to the daemon if one is running)
+		server = startHTTPServer(pRoot+"/upstream")
+		packageURL = "http://127.0.0.1:"+str(server.server_address[1])+"/bench.db"
+		script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PackTrack.py")
+		if "startup.interpreter" in selected:
+			timeBenchmark("startup.interpreter", pOptions.repeat, None, lambda: subprocess.run([sys.executable, "-c", "pass"]).returncode == 0, pResults)
+		if "startup.download" in selected:
+			def setup():
+				if os.path.isfile(pRoot+"/bench.pkg.tar.zst"):
+					os.unlink(pRoot+"/bench.pkg.tar.zst")
+			timeBenchmark("startup.download", pOptions.repeat, setup, lambda: subprocess.run([sys.executable, script, "SYNC", packageURL, pRoot+"/bench.pkg.tar.zst"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0, pResults)
+			if pOptions.baseline_script is not None:
+				# The same download by another PacTrack.py (such as a release before
+				# the launcher), reported relative to it
+				baselineScript = os.path.abspath(pOptions.baseline_script)
+				timeBenchmark("startup.download.baseline", pOptions.repeat, setup, lambda: subprocess.run([sys.executable, baselineScript, "SYNC", packageURL, pRoot+"/bench.pkg.tar.zst"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0, pResults)
+				pResults["startup.download"]["baselineRatio"] = pResults["startup.download"]["median"]/pResults["startup.download.baseline"]["median"]
+				print("Benchmark 'startup.download': "+"%.2f" % pResults["startup.download"]["baselineRatio"]+"x the baseline script", file=sys.stderr)
+		server.shutdown()
+
+# ----------------------------------------------------------------------------
+
+def main(pArgs):
+	"""
+	Main routine
+	Arguments:
+		pArgs	--	raw program arguments
+	"""
+	parser = argparse.ArgumentParser(description="Benchmark PacTrack against a synthetic repository database")
+	parser.add_argument("--packages", type=int, default=5000, help="number of packages in the repository")
+	parser.add_argument("--groups", type=int, default=50, help="number of groups in the repository")
+	parser.add_argument("--group-ratio", type=float, default=0.2, help="share of packages that belong to groups")
+	parser.add_argument("--fanout", type=int, default=1, help="number of groups each grouped package belongs to")
+	parser.add_argument("--desc-size", type=int, default=200, help="length of each package description in characters")
+	parser.add_argument("--mods-density", type=float, default=0.01, help="share of packages and groups with a dependencymods file")
+	parser.add_argument("--compression", choices=["gz", "xz", "bz2", "none"], default="gz", help="compression of the synthetic database")
+	parser.add_argument("--source", choices=["file", "http"], default="file", help="serve the database from a local file or a local HTTP server")
+	parser.add_argument("--workers", type=int, default=1, help="description worker processes (DATABASE_WORKERS, 0 for one per CPU)")
+	parser.add_argument("--real-tools", dest="stub_tools", action="store_false", help="run makepkg for real instead of the stub")
+	parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+	parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic repository")
+	parser.add_argument("--baseline-script", default=None, help="also time startup.download with this PacTrack.py, such as an earlier version, to compare against")
+	parser.add_argument("--benchmarks", default=None, help="comma separated benchmarks to run (default: all of "+",".join(BENCHMARKS)+")")
+	parser.add_argument("--output", default=None, help="write the JSON results to this file instead of stdout")
+	options = parser.parse_args(pArgs[1:])
+
+	results = {}
+	root = tempfile.mkdtemp(prefix="pactrack-bench-")
+	try:
+		runBenchmarks(root, options, results)
+	finally:
+		shutil.rmtree(root, ignore_errors=True)
+	record = {"timestamp": int(time.time()), "python": platform.python_version(), "platform": platform.platform(), "options": vars(options), "results": results}
+	if options.output is None:
+		print(json.dumps(record, indent=2))
+	else:
+		outputFile = open(options.output, "w")
+		outputFile.write(json.dumps(record, indent=2)+"\n")
+		outputFile.close()
+	return True
+
+# ----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+	if not main(sys.argv):
+		sys.exit(1)
+	else:
+		sys.exit(0)
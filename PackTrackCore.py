@@ -0,0 +1,3603 @@
+##############################################################################
+#                                 PacTrack                                   #
+#             Package Relationship Modification Tool For Pacman              #
+##############################################################################
+
+# PacTrack's code and settings, loaded by the PacTrack.py launcher. Keeping 
+# them in a module lets Python cache their compiled bytecode, so that a run 
+# started by pacman does not compile the whole program again
+
+import sys
+import os.path
+import contextlib
+import threading
+import time
+
+# Only the modules needed by every run are imported here, so that plain
+# package downloads start quickly. Download and daemon functions import what
+# they use themselves, and the database, group and metapackage machinery is
+# loaded by importDatabaseModules() when a database is processed
+
+# TODO:
+# on-exit and on-error cleanup of /tmp etc
+
+# ----------------------------------------------------------------------------
+
+PACTRACK_ETC_DIR="/etc/pactrack"
+PACTRACK_LIB_DIR="/var/lib/pactrack"
+PACMAN_LIB_DIR="/var/lib/pacman"
+# Metapackages are built once per sync, when the metapackage repository's 
+# database is downloaded or after the last repository in PACMAN_CONF
+PACMAN_CONF="/etc/pacman.conf"
+META_REPOSITORY_NAME="metapackages"
+META_REPOSITORY="/home/"+META_REPOSITORY_NAME
+# Note: TEMP_DIR will be recreated, and so must not point to a location with
+#       data in it
+TEMP_DIR="/tmp/pactrack"
+# Database processing mode: "stream" rewrites the downloaded database archive
+# member by member in memory, "extract" unpacks it to TEMP_DIR with tar
+DATABASE_MODE="stream"
+# Compression of the processed databases handed to pacman: "none", "gzip" or 
+# "zstd", at DATABASE_COMPRESSION_LEVEL (1-9 for gzip, 1-19 for zstd). zstd 
+# uses DATABASE_COMPRESSION_THREADS threads (0 for one per CPU), through 
+# python-zstandard if available and the zstd command otherwise
+DATABASE_COMPRESSION="none"
+DATABASE_COMPRESSION_LEVEL=3
+DATABASE_COMPRESSION_THREADS=0
+# Package descriptions that are not in the description cache are processed 
+# in batches by this many worker processes (0 for one per CPU), or in 
+# PacTrack's own process if 1
+DATABASE_WORKERS=1
+# Processed package descriptions are cached per repository between syncs, up
+# to this many packages per repository
+DESC_CACHE_SIZE=50000
+DESC_CACHE_FORMAT=2
+# Maximum number of metapackages built at the same time
+BUILD_CONCURRENCY=4
+# Metapackage builder: "native" writes the package archive directly, 
+# "makepkg" builds it with makepkg as the user "nobody"
+METAPACKAGE_BUILDER="native"
+# Metapackages built by makepkg are kept in PACTRACK_LIB_DIR/packagecache by 
+# a digest of their dependencies, and reused (with a new version) when a 
+# group returns to the same dependencies; up to this many bytes, least 
+# recently used first, or 0 to disable
+METAPACKAGE_CACHE_SIZE=16*1024*1024
+# .PKGINFO keys and the repository database desc sections they are written to,
+# in repo-add's order
+REPOSITORY_DESC_SECTIONS=[("filename", "FILENAME"), ("pkgname", "NAME"), ("pkgbase", "BASE"), ("pkgver", "VERSION"), ("pkgdesc", "DESC"), ("group", "GROUPS"), ("csize", "CSIZE"), ("size", "ISIZE"), ("md5sum", "MD5SUM"), ("sha256sum", "SHA256SUM"), ("url", "URL"), ("license", "LICENSE"), ("arch", "ARCH"), ("builddate", "BUILDDATE"), ("packager", "PACKAGER"), ("replaces", "REPLACES"), ("conflict", "CONFLICTS"), ("provides", "PROVIDES"), ("depend", "DEPENDS"), ("optdepend", "OPTDEPENDS"), ("makedepend", "MAKEDEPENDS"), ("checkdepend", "CHECKDEPENDS")]
+# Downloader: "builtin" downloads HTTP(S) URLs in-process with keep-alive 
+# connections (databases, segmented downloads and everything the daemon 
+# downloads; single packages downloaded by a one-shot run still go to wget), 
+# "wget" runs wget for every file. FTP and other URLs are always downloaded 
+# with wget. Both use the proxies set in http_proxy, https_proxy, ftp_proxy 
+# and no_proxy, and the builtin downloader falls back to all_proxy
+DOWNLOADER="builtin"
+# Download timeout for connecting and for each read, in seconds
+DOWNLOAD_TIMEOUT=30
+DOWNLOAD_MAX_REDIRECTS=5
+DOWNLOAD_CHUNK_SIZE=65536
+# Split builtin HTTP downloads into this many byte ranges fetched concurrently
+# (1 to disable), for files of at least DOWNLOAD_SEGMENT_MIN_SIZE bytes per 
+# range on servers that accept ranges
+DOWNLOAD_SEGMENTS=1
+DOWNLOAD_SEGMENT_MIN_SIZE=4*1024*1024
+DEBUG=False
+# Append per-run timings and counters to PACTRACK_LIB_DIR/metrics.log; can also
+# be enabled with --metrics or PACTRACK_METRICS=1
+METRICS=False
+# ----------------------------------------------------------------------------
+
+# Dependency modifications, loaded once per run by loadDependencyMods()
+dependencyModsIndex = None
+# Timings and counters for this run, if enabled (see startMetrics())
+metrics = None
+# Idle keep-alive download connections, by scheme and host
+downloadConnections = {}
+downloadConnectionsLock = threading.Lock()
+# Set while running as a daemon, which keeps the groups store open between 
+# requests
+daemonRunning = False
+# Unix socket of the daemon, passed to main() from PacTrack.py's DAEMON_SOCKET
+daemonSocket = None
+groupsStore = None
+
+# ----------------------------------------------------------------------------
+
+def debugMsg(pMessage):
+	"""
+	Print a message if DEBUG_LEVEL is set high enough
+	Arguments:
+		pDebugLevel	--	the debug level to check against
+		pMessage		--	the message to print	
+	Returns true if the message was printed
+	"""
+	if DEBUG:
+		print("[DEBUG] "+pMessage)
+		return True
+	return False
+# ----------------------------------------------------------------------------
+
+def importDatabaseModules():
+	"""
+	Import the modules used to rewrite databases, track groups and build 
+	metapackages
+	"""
+	global collections, concurrent, fnmatch, grp, gzip, hashlib, io, json, pwd, re, shutil, sqlite3, subprocess, tarfile, zstandard
+	import collections
+	import concurrent.futures
+	import fnmatch
+	import grp
+	import gzip
+	import hashlib
+	import io
+	import json
+	import pwd
+	import re
+	import shutil
+	import sqlite3
+	import subprocess
+	import tarfile
+	# zstd-compressed archives are read and written with python-zstandard if
+	# it is available, and with the zstd command otherwise
+	try:
+		import zstandard
+	except ImportError:
+		zstandard = None
+
+# ----------------------------------------------------------------------------
+
+def startMetrics(pAction):
+	"""
+	Start collecting timings and counters for this run
+	Arguments:
+		pAction	--	the action being run
+	"""
+	global metrics
+	metrics = {"action": pAction, "start": time.time(), "startCounter": time.perf_counter(), "spans": [], "stack": [], "counters": {}, "lock": threading.Lock()}
+
+# ----------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def metricsSpan(pName):
+	"""
+	Time a stage of processing, if metrics are being collected. Spans nest, and
+	are named after their enclosing spans, e.g. "processDatabase/download"
+	Arguments:
+		pName	--	the stage name
+	"""
+	if metrics is None:
+		yield
+		return
+	metrics["stack"].append(pName)
+	spanName = "/".join(metrics["stack"])
+	startTime = time.perf_counter()
+	try:
+		yield
+	finally:
+		metrics["stack"].pop()
+		metrics["spans"].append({"name": spanName, "start": round(startTime-metrics["startCounter"], 6), "duration": round(time.perf_counter()-startTime, 6)})
+
+# ----------------------------------------------------------------------------
+
+def countMetric(pName, pAmount):
+	"""
+	Add to a counter, if metrics are being collected
+	Arguments:
+		pName		--	the counter name
+		pAmount	--	the amount to add
+	"""
+	if metrics is None:
+		return
+	with metrics["lock"]:
+		metrics["counters"][pName] = metrics["counters"].get(pName, 0)+pAmount
+
+# ----------------------------------------------------------------------------
+
+def writeMetrics(pArguments, pResult):
+	"""
+	Append the metrics collected during this run to PACTRACK_LIB_DIR/metrics.log
+	as a single JSON record
+	Arguments:
+		pArguments	--	the action arguments
+		pResult			--	whether the action succeeded
+	Returns true if the record was written
+	"""
+	if metrics is None:
+		return False
+	import json
+	record = {"time": metrics["start"], "action": metrics["action"], "arguments": pArguments, "result": pResult, "duration": round(time.perf_counter()-metrics["startCounter"], 6), "spans": metrics["spans"], "counters": metrics["counters"]}
+	if not directoryRequired(PACTRACK_LIB_DIR, False):
+		return False
+	try:
+		metricsFile = open(PACTRACK_LIB_DIR+"/metrics.log", "a")
+		metricsFile.write(json.dumps(record)+"\n")
+		metricsFile.close()
+	except:
+		print("Warning: failed to write metrics to '"+PACTRACK_LIB_DIR+"/metrics.log'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def copyFile(pSourceFile, pDestFile):
+	"""
+	Copy a file, ensuring that any existing destination file can be removed 
+	first
+	Arguments:
+		pSourceFile	--	the source filename
+		pDestFile		--	the destination filename
+	Returns true if the file was successfully copied
+	"""
+	import shutil
+	debugMsg("Copy file '"+pSourceFile+"' to '"+pDestFile+"'")
+	if not os.path.isfile(pSourceFile):
+		debugMsg("Failed to copy file '"+pSourceFile+"' to '"+pDestFile+"': source is not a file or does not exist") 
+		return False
+	if os.path.isfile(pDestFile):
+		try:
+			os.unlink(pDestFile)
+		except:
+			debugMsg("Failed to copy file '"+pSourceFile+"' to '"+pDestFile+"': failed to remove destination file") 
+			return False
+	try:
+		shutil.copyfile(pSourceFile, pDestFile)
+	except:
+		debugMsg("Failed to copy file '"+pSourceFile+"' to '"+pDestFile+"': copying failed") 
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def publishFile(pSourceFile, pDestFile):
+	"""
+	Replace a file atomically with another: the source is staged next to the
+	destination as a hard link where possible, then a reflink, and a copy 
+	otherwise, and renamed over it, so readers see either the old or the new 
+	file and large files are not copied on the same filesystem. The source 
+	must not be modified in place afterwards, as it may share the published 
+	file's data
+	Arguments:
+		pSourceFile	--	the source filename
+		pDestFile		--	the destination filename
+	Returns true if the file was successfully published
+	"""
+	import shutil
+	debugMsg("Publish file '"+pSourceFile+"' to '"+pDestFile+"'")
+	if not os.path.isfile(pSourceFile):
+		debugMsg("Failed to publish file '"+pSourceFile+"' to '"+pDestFile+"': source is not a file or does not exist") 
+		return False
+	stagingFile = os.path.join(os.path.dirname(pDestFile), "."+os.path.basename(pDestFile)+".publish")
+	try:
+		if os.path.lexists(stagingFile):
+			os.unlink(stagingFile)
+		try:
+			os.link(pSourceFile, stagingFile)
+			countMetric("filesLinked", 1)
+		except OSError:
+			if not cloneFile(pSourceFile, stagingFile):
+				shutil.copyfile(pSourceFile, stagingFile)
+				countMetric("bytesCopied", os.path.getsize(stagingFile))
+		os.replace(stagingFile, pDestFile)
+	except:
+		try:
+			if os.path.lexists(stagingFile):
+				os.unlink(stagingFile)
+		except:
+			pass
+		debugMsg("Failed to publish file '"+pSourceFile+"' to '"+pDestFile+"'") 
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def cloneFile(pSourceFile, pDestFile):
+	"""
+	Create a copy-on-write clone (reflink) of a file, on filesystems that 
+	support it
+	Arguments:
+		pSourceFile	--	the source filename
+		pDestFile		--	the clone to create
+	Returns true if the clone was created
+	"""
+	import fcntl
+	# FICLONE from linux/fs.h
+	FICLONE = 0x40049409
+	try:
+		sourceFile = open(pSourceFile, "rb")
+	except:
+		return False
+	try:
+		destFile = open(pDestFile, "wb")
+	except:
+		sourceFile.close()
+		return False
+	try:
+		fcntl.ioctl(destFile.fileno(), FICLONE, sourceFile.fileno())
+		cloned = True
+	except OSError:
+		cloned = False
+	destFile.close()
+	sourceFile.close()
+	if not cloned:
+		os.unlink(pDestFile)
+	return cloned
+
+# ----------------------------------------------------------------------------
+
+def publishSymlink(pTarget, pLinkName):
+	"""
+	Create or replace a symlink atomically
+	Arguments:
+		pTarget		--	the symlink target
+		pLinkName	--	the symlink to create
+	Returns true if the symlink was created
+	"""
+	stagingLink = os.path.join(os.path.dirname(pLinkName), "."+os.path.basename(pLinkName)+".publish")
+	try:
+		if os.path.lexists(stagingLink):
+			os.unlink(stagingLink)
+		os.symlink(pTarget, stagingLink)
+		os.replace(stagingLink, pLinkName)
+	except:
+		debugMsg("Failed to create symlink '"+pLinkName+"' to '"+pTarget+"'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeFile(pFilename, pContents):
+	"""
+	Write specified text to a file, backing the file up first and removing the 
+	backup if the write succeeds
+	Arguments:
+		pFileName	-- the file to write to
+		pContents	-- text content to write
+	Returns true if the file was successfully written
+	"""
+	import shutil
+	debugMsg("Writing to file '"+pFilename+"'")
+	if not directoryRequired(os.path.dirname(pFilename), False):
+		return False
+	if os.path.exists(pFilename+".bak"):
+		print("Warning: removing existing backup file '"+pFilename+".bak'")
+		try:
+			os.unlink(pFilename+".bak")
+		except:
+			print("Warning: failed to remove backup file '"+pFilename+".bak'")
+		try:
+			shutil.copyfile(pFilename, pFilename+".bak")
+		except:
+			print("Warning: could not create file '"+pFilename+".bak'")
+	returnCode=True
+	try:
+		outputFile = open(pFilename, "w")
+		outputFile.write(pContents)
+		outputFile.close()
+	except:
+		debugMsg("Failed to write to file '"+pFilename+"'")
+		returnCode=False
+		try:
+			outputFile.close()
+		except:
+			pass
+	if os.path.exists(pFilename+".bak"):
+		try:
+			os.unlink(pFilename+".bak")
+		except:
+			print("Warning: failed to remove backup file '"+pFilename+".bak'")
+	return returnCode
+
+# ----------------------------------------------------------------------------
+
+def directoryRequired(pPath, pMustBeEmpty):
+	"""
+	Create a directory if it does not exist (or remove and re-create if it must
+	me empty)
+	Arguments:
+		pPath					--	directory path that must exist
+		pMustBeEmpty	--	does the directory need to be empty?
+	Returns true if the directory was (re-)created successfully
+	"""
+	import shutil
+# TODO: permissions
+	if pMustBeEmpty:
+		if os.path.isdir(pPath):
+			try:
+				shutil.rmtree(pPath)
+			except:
+				debugMsg("Failed to remove existing directory tree '"+pPath+"'")
+				return False
+	try:
+		debugMsg("Creating directory '"+pPath+"'")
+		os.makedirs(pPath, exist_ok=True)
+	except:
+		print("Error: failed to create directory '"+pPath+"'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def runCommand(pCommand, pCwd, pQuiet):
+	"""
+	Run an external command through the shell
+	Arguments:
+		pCommand	--	the command line to run
+		pCwd			--	the working directory, or None for the current directory
+		pQuiet		--	whether to supress output
+	Returns true if the command exited successfully
+	"""
+	import subprocess
+	debugMsg("Running command '"+pCommand+"'")
+	countMetric("subprocessesSpawned", 1)
+	if pQuiet:
+		process = subprocess.run(pCommand, shell=True, cwd=pCwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	else:
+		process = subprocess.run(pCommand, shell=True, cwd=pCwd)
+	return process.returncode == 0
+
+# ----------------------------------------------------------------------------
+
+def getDownloadProxy(pScheme, pHost):
+	"""
+	Find the proxy to download from a host through, from the http_proxy, 
+	https_proxy and no_proxy environment variables as wget uses them, or 
+	all_proxy if no proxy is set for the scheme
+	Arguments:
+		pScheme	--	"http" or "https"
+		pHost		--	the host (and optional port) to download from
+	Returns the proxy's host (and optional port) and its Proxy-Authorization 
+	header value (or None), or None if the host is not downloaded through a 
+	proxy
+	"""
+	# urllib.request is slow to import, so it is only loaded if a proxy is set
+	if not any([name.lower() in ["http_proxy", "https_proxy", "all_proxy"] for name in os.environ]):
+		return None
+	import base64
+	import urllib.parse
+	import urllib.request
+	proxies = urllib.request.getproxies()
+	proxyURL = proxies.get(pScheme, proxies.get("all", ""))
+	if proxyURL == "" or urllib.request.proxy_bypass(pHost):
+		return None
+	if "://" not in proxyURL:
+		proxyURL = "http://"+proxyURL
+	parsedURL = urllib.parse.urlsplit(proxyURL)
+	if parsedURL.scheme != "http":
+		print("Warning: ignoring proxy '"+proxyURL+"', only http:// proxies are supported")
+		return None
+	authorization = None
+	if parsedURL.username is not None:
+		credentials = urllib.parse.unquote(parsedURL.username)+":"+urllib.parse.unquote(parsedURL.password or "")
+		authorization = "Basic "+base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+	return (parsedURL.netloc.rpartition("@")[2], authorization)
+
+# ----------------------------------------------------------------------------
+
+def acquireConnection(pScheme, pHost):
+	"""
+	Take an idle keep-alive connection to a host from the connection pool, or 
+	open a new one, through the host's proxy if it has one
+	Arguments:
+		pScheme	--	"http" or "https"
+		pHost		--	the host (and optional port) to connect to
+	Returns the connection
+	"""
+	import http.client
+	with downloadConnectionsLock:
+		idleConnections = downloadConnections.get(pScheme+"://"+pHost, [])
+		if len(idleConnections) > 0:
+			return idleConnections.pop()
+	proxy = getDownloadProxy(pScheme, pHost)
+	if proxy is None:
+		debugMsg("Opening connection to '"+pScheme+"://"+pHost+"'")
+		if pScheme == "https":
+			return http.client.HTTPSConnection(pHost, timeout=DOWNLOAD_TIMEOUT)
+		return http.client.HTTPConnection(pHost, timeout=DOWNLOAD_TIMEOUT)
+	(proxyHost, proxyAuthorization) = proxy
+	debugMsg("Opening connection to '"+pScheme+"://"+pHost+"' through proxy '"+proxyHost+"'")
+	if pScheme == "https":
+		# HTTPS is tunnelled through the proxy with CONNECT
+		connection = http.client.HTTPSConnection(proxyHost, timeout=DOWNLOAD_TIMEOUT)
+		connection.set_tunnel(pHost, headers={"Proxy-Authorization": proxyAuthorization} if proxyAuthorization is not None else None)
+		return connection
+	return http.client.HTTPConnection(proxyHost, timeout=DOWNLOAD_TIMEOUT)
+
+# ----------------------------------------------------------------------------
+
+def releaseConnection(pScheme, pHost, pConnection, pResponse):
+	"""
+	Return a connection to the connection pool once its response has been read
+	completely, or close it if it cannot be reused
+	Arguments:
+		pScheme			--	"http" or "https"
+		pHost				--	the host (and optional port) the connection is to
+		pConnection	--	the connection
+		pResponse		--	the last response read from the connection, or None if
+										the response was not read completely
+	"""
+	if pResponse is None or pResponse.will_close:
+		pConnection.close()
+		return
+	with downloadConnectionsLock:
+		downloadConnections.setdefault(pScheme+"://"+pHost, []).append(pConnection)
+
+# ----------------------------------------------------------------------------
+
+def openHTTPResponse(pURL, pMethod, pHeaders, pConnection):
+	"""
+	Send an HTTP(S) request over a pooled keep-alive connection, following 
+	redirects. Plain HTTP requests through a proxy are sent to the proxy with 
+	the absolute URL
+	Arguments:
+		pURL								--	the URL to request
+		pMethod							--	the request method
+		pHeaders						--	extra request headers
+		pConnection	(out)	--	returns the scheme, host and connection that the 
+													response must be read from and released to, and the 
+													final URL after redirects
+	Returns the response, or None if the request failed
+	"""
+	import http.client
+	import urllib.parse
+	url = pURL
+	for redirect in range(DOWNLOAD_MAX_REDIRECTS+1):
+		parsedURL = urllib.parse.urlsplit(url)
+		path = parsedURL.path if parsedURL.path != "" else "/"
+		if parsedURL.query != "":
+			path += "?"+parsedURL.query
+		headers = pHeaders
+		proxy = getDownloadProxy(parsedURL.scheme, parsedURL.netloc) if parsedURL.scheme == "http" else None
+		if proxy is not None:
+			path = "http://"+parsedURL.netloc+path
+			if proxy[1] is not None:
+				headers = dict(pHeaders)
+				headers["Proxy-Authorization"] = proxy[1]
+		response = None
+		# A pooled connection may have been closed by the server, so retry once
+		# on a new connection
+		for attempt in range(2):
+			connection = acquireConnection(parsedURL.scheme, parsedURL.netloc)
+			try:
+				connection.request(pMethod, path, headers=headers)
+				response = connection.getresponse()
+				break
+			except (http.client.HTTPException, OSError):
+				connection.close()
+		if response is None:
+			debugMsg("Failed to request URL '"+url+"'")
+			return None
+		if response.status in [301, 302, 303, 307, 308] and response.getheader("Location") is not None:
+			response.read()
+			releaseConnection(parsedURL.scheme, parsedURL.netloc, connection, response)
+			url = urllib.parse.urljoin(url, response.getheader("Location"))
+			debugMsg("Redirected to '"+url+"'")
+			continue
+		pConnection.extend([parsedURL.scheme, parsedURL.netloc, connection, url])
+		return response
+	debugMsg("Too many redirects for URL '"+pURL+"'")
+	return None
+
+# ----------------------------------------------------------------------------
+
+def printProgress(pName, pReceived, pTotal):
+	"""
+	Print a download progress line on a terminal
+	Arguments:
+		pName			--	the name of the file being downloaded
+		pReceived	--	bytes received so far
+		pTotal		--	total bytes expected, or 0 if unknown
+	"""
+	if sys.stderr.isatty():
+		if pTotal > 0:
+			sys.stderr.write("\r"+pName+" "+str(pReceived*100//pTotal)+"%")
+		else:
+			sys.stderr.write("\r"+pName+" "+str(pReceived//1024)+"K")
+		sys.stderr.flush()
+
+# ----------------------------------------------------------------------------
+
+def downloadHTTP(pURL, pOutputFile, pQuiet, pValidators):
+	"""
+	Download a file over HTTP(S), resuming an existing partial file as wget -c
+	does
+	Arguments:
+		pURL							--	the location to download from	
+		pOutputFile				--	the location to save the file
+		pQuiet						-- 	whether to supress output
+		pValidators	(out)	--	None, or the ETag and Last-Modified values of a 
+												previous download to make the request conditional on; 
+												replaced with those of the response, and "notModified" 
+												is set if the file is unchanged
+	Returns true if the file was downloaded successfully or is unchanged
+	"""
+	resumeFrom = os.path.getsize(pOutputFile) if os.path.isfile(pOutputFile) else 0
+	headers = {}
+	if resumeFrom > 0:
+		headers["Range"] = "bytes="+str(resumeFrom)+"-"
+	elif pValidators is not None:
+		if pValidators.get("etag") is not None:
+			headers["If-None-Match"] = pValidators["etag"]
+		if pValidators.get("lastModified") is not None:
+			headers["If-Modified-Since"] = pValidators["lastModified"]
+	connection = []
+	response = openHTTPResponse(pURL, "GET", headers, connection)
+	if response is None:
+		return False
+	(scheme, host, connection, url) = connection
+	try:
+		if response.status == 304 and pValidators is not None:
+			debugMsg("URL '"+pURL+"' is not modified")
+			response.read()
+			releaseConnection(scheme, host, connection, response)
+			pValidators["notModified"] = True
+			return True
+		if pValidators is not None:
+			pValidators["etag"] = response.getheader("ETag")
+			pValidators["lastModified"] = response.getheader("Last-Modified")
+		if response.status == 416 and resumeFrom > 0:
+			# The existing file is already complete
+			debugMsg("File '"+pOutputFile+"' is already completely downloaded")
+			response.read()
+			releaseConnection(scheme, host, connection, response)
+			return True
+		if response.status == 206 and resumeFrom > 0 and not response.getheader("Content-Range", "").startswith("bytes "+str(resumeFrom)+"-"):
+			# The server did not return the rest of the file, so the partial file
+			# is downloaded again from the start
+			debugMsg("Server did not resume URL '"+pURL+"' at byte "+str(resumeFrom)+", downloading it again")
+			releaseConnection(scheme, host, connection, None)
+			os.unlink(pOutputFile)
+			return downloadHTTP(pURL, pOutputFile, pQuiet, pValidators)
+		if response.status == 206 and resumeFrom > 0:
+			outputFile = open(pOutputFile, "ab")
+		elif response.status == 200:
+			resumeFrom = 0
+			outputFile = open(pOutputFile, "wb")
+		else:
+			debugMsg("Server returned status "+str(response.status)+" for URL '"+pURL+"'")
+			response.read()
+			releaseConnection(scheme, host, connection, response)
+			return False
+		received = resumeFrom
+		total = resumeFrom+int(response.getheader("Content-Length", "0"))
+		while True:
+			chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+			if not chunk:
+				break
+			outputFile.write(chunk)
+			received += len(chunk)
+			if not pQuiet:
+				printProgress(os.path.basename(pOutputFile), received, total)
+		outputFile.close()
+		if not pQuiet and sys.stderr.isatty():
+			sys.stderr.write("\n")
+	except:
+		try:
+			outputFile.close()
+		except:
+			pass
+		releaseConnection(scheme, host, connection, None)
+		debugMsg("Failed to read response for URL '"+pURL+"'")
+		return False
+	releaseConnection(scheme, host, connection, response)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def downloadSegment(pURL, pFileDescriptor, pStart, pEnd, pValidator, pProgress):
+	"""
+	Download one byte range of a file and write it in place
+	Arguments:
+		pURL							--	the location to download from
+		pFileDescriptor		--	the output file, opened for writing
+		pStart						--	the first byte of the range
+		pEnd							--	the last byte of the range
+		pValidator				--	the ETag or Last-Modified value the file must still 
+													have, or None
+		pProgress	(out)		--	progress state shared by all segments
+	Returns true if the whole range was downloaded
+	"""
+	headers = {"Range": "bytes="+str(pStart)+"-"+str(pEnd)}
+	if pValidator is not None:
+		headers["If-Range"] = pValidator
+	connection = []
+	response = openHTTPResponse(pURL, "GET", headers, connection)
+	if response is None:
+		return False
+	(scheme, host, connection, url) = connection
+	if response.status != 206 or not response.getheader("Content-Range", "").startswith("bytes "+str(pStart)+"-"+str(pEnd)+"/"):
+		# The server ignored the range, or the file changed since it was probed
+		debugMsg("Server did not return range "+str(pStart)+"-"+str(pEnd)+" of URL '"+pURL+"'")
+		releaseConnection(scheme, host, connection, None)
+		return False
+	offset = pStart
+	try:
+		while offset <= pEnd:
+			chunk = response.read(min(DOWNLOAD_CHUNK_SIZE, pEnd+1-offset))
+			if not chunk:
+				break
+			os.pwrite(pFileDescriptor, chunk, offset)
+			offset += len(chunk)
+			with pProgress["lock"]:
+				pProgress["received"] += len(chunk)
+				if not pProgress["quiet"]:
+					printProgress(pProgress["name"], pProgress["received"], pProgress["total"])
+	except:
+		releaseConnection(scheme, host, connection, None)
+		debugMsg("Failed to read range "+str(pStart)+"-"+str(pEnd)+" of URL '"+pURL+"'")
+		return False
+	if offset != pEnd+1:
+		releaseConnection(scheme, host, connection, None)
+		debugMsg("Range "+str(pStart)+"-"+str(pEnd)+" of URL '"+pURL+"' was truncated")
+		return False
+	response.read()
+	releaseConnection(scheme, host, connection, response)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def downloadHTTPSegmented(pURL, pOutputFile, pQuiet):
+	"""
+	Download a file over HTTP(S) as DOWNLOAD_SEGMENTS byte ranges fetched
+	concurrently, falling back to a single stream if the server does not 
+	support ranges, the file is small, or a partial file is being resumed
+	Arguments:
+		pURL				--	the location to download from	
+		pOutputFile	--	the location to save the file
+		pQuiet			-- 	whether to supress output
+	Returns true if the file was downloaded successfully
+	"""
+	import concurrent.futures
+	if os.path.isfile(pOutputFile) and os.path.getsize(pOutputFile) > 0:
+		return downloadHTTP(pURL, pOutputFile, pQuiet, None)
+	connection = []
+	response = openHTTPResponse(pURL, "HEAD", {}, connection)
+	if response is None:
+		return downloadHTTP(pURL, pOutputFile, pQuiet, None)
+	(scheme, host, connection, url) = connection
+	response.read()
+	releaseConnection(scheme, host, connection, response)
+	size = int(response.getheader("Content-Length", "0"))
+	if response.status != 200 or response.getheader("Accept-Ranges", "").lower() != "bytes" or size < DOWNLOAD_SEGMENTS*DOWNLOAD_SEGMENT_MIN_SIZE:
+		debugMsg("Downloading URL '"+pURL+"' as a single stream")
+		return downloadHTTP(pURL, pOutputFile, pQuiet, None)
+	# Ranges are requested from the final URL after any redirects, and only 
+	# while the file is unchanged
+	validator = response.getheader("ETag")
+	if validator is None or validator.startswith("W/"):
+		validator = response.getheader("Last-Modified")
+	debugMsg("Downloading URL '"+pURL+"' as "+str(DOWNLOAD_SEGMENTS)+" segments")
+	countMetric("segmentedDownloads", 1)
+	try:
+		fileDescriptor = os.open(pOutputFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+		os.ftruncate(fileDescriptor, size)
+	except:
+		debugMsg("Failed to create file '"+pOutputFile+"'")
+		return False
+	progress = {"lock": threading.Lock(), "received": 0, "total": size, "name": os.path.basename(pOutputFile), "quiet": pQuiet}
+	segmentSize = size//DOWNLOAD_SEGMENTS
+	with concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_SEGMENTS) as executor:
+		segments = []
+		for index in range(DOWNLOAD_SEGMENTS):
+			start = index*segmentSize
+			end = size-1 if index == DOWNLOAD_SEGMENTS-1 else start+segmentSize-1
+			segments.append(executor.submit(downloadSegment, url, fileDescriptor, start, end, validator, progress))
+		downloaded = all([segment.result() for segment in segments])
+	os.close(fileDescriptor)
+	if not pQuiet and sys.stderr.isatty():
+		sys.stderr.write("\n")
+	return downloaded
+
+# ----------------------------------------------------------------------------
+
+def downloadFile(pURL, pOutputFile, pQuiet, pValidators):
+	"""
+	Download a file from a given URL
+	Arguments:
+		pURL							--	the location to download from	
+		pOutputFile				--	the location to save the file
+		pQuiet						-- 	whether to supress output
+		pValidators	(out)	--	None, or validators for a conditional download (see 
+												downloadHTTP()); only the builtin HTTP downloader 
+												uses them, and the others clear them
+	Returns true if the file was downloaded successfully or is unchanged
+	"""
+	debugMsg("Downloading URL '"+pURL+"' to file '"+pOutputFile+"'")	
+	# pacman starts PacTrack for every package it downloads, and wget starts 
+	# faster than http.client loads, so a one-shot run only downloads in-process
+	# for conditional (database) and segmented downloads. The daemon downloads 
+	# everything in-process, reusing its connections between packages
+	builtinURL = DOWNLOADER == "builtin" and (pURL.lower().startswith("http://") or pURL.lower().startswith("https://"))
+	builtinURL = builtinURL and (daemonRunning or pValidators is not None or DOWNLOAD_SEGMENTS > 1)
+	if pValidators is not None and not builtinURL:
+		pValidators.clear()
+	if builtinURL:
+		if DOWNLOAD_SEGMENTS > 1 and pValidators is None:
+			downloaded = downloadHTTPSegmented(pURL, pOutputFile, pQuiet)
+		else:
+			downloaded = downloadHTTP(pURL, pOutputFile, pQuiet, pValidators)
+	else:
+		# The builtin downloader also leaves FTP and other URLs to wget, so 
+		# that their partial files are resumed
+		#TODO: see why shlex doesn't work to construct command line
+		downloaded = runCommand("/usr/bin/wget -c -q --show-progress --passive-ftp -O \""+pOutputFile+"\" \""+pURL+"\"", None, pQuiet)
+	# Clean up any partial downloads on failure 
+	# Particularly for zero-byte .sig files
+	if not downloaded:
+		try:
+			if os.path.isfile(pOutputFile):	
+				os.unlink(pOutputFile)
+		except:
+			pass
+		debugMsg("Failed to download URL '"+pURL+"' to file '"+pOutputFile+"'")	
+		return False
+	elif pValidators is not None and pValidators.get("notModified", False):
+		return True
+	else:
+		countMetric("bytesDownloaded", os.path.getsize(pOutputFile))
+		return True
+
+# ----------------------------------------------------------------------------
+
+def readDependencyModsFile(pFilename, pDependencyMods):
+	"""
+	Read a list of user-specified changes to dependencies from a file
+	Arguments:
+		pFilename							--	the file to read
+		pDependencyMods	(out)	--	the list of changes in the file
+	Returns true if the file was read successfully
+	"""
+	debugMsg("Reading dependency modifications from '"+pFilename+"'")
+	try:
+		packageDepFile = open(pFilename, "r")
+		for line in packageDepFile:
+			line = line.replace("\n", "").strip()
+			if line.startswith("+") or line.startswith("-"):
+				if line[1:].replace("\n", "").strip() != "":
+					if line[1:] not in pDependencyMods:
+						pDependencyMods[line[1:]] = line[0]
+		packageDepFile.close()
+	except:
+		try:
+			packageDepFile.close()
+		except:
+			pass
+		debugMsg("Failed to read dependency modifications from '"+pFilename+"'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def getDependencyModsDirectoryFingerprint(pPath):
+	"""
+	Fingerprint the dependency modifications directory and the files in it
+	Arguments:
+		pPath	--	the dependency modifications directory
+	Returns the fingerprint, or an empty string if the directory does not exist
+	"""
+	try:
+		fingerprint = str(os.stat(pPath).st_mtime_ns)
+		# Files edited in place do not change the directory mtime
+		for entry in sorted(os.scandir(pPath), key=lambda entry: entry.name):
+			entryStat = entry.stat()
+			fingerprint += ":"+entry.name+"/"+str(entryStat.st_mtime_ns)+"/"+str(entryStat.st_size)
+	except:
+		return ""
+	return hashlib.sha256(fingerprint.encode("utf-8", "surrogateescape")).hexdigest()
+
+# ----------------------------------------------------------------------------
+
+def loadDependencyMods():
+	"""
+	Load every dependency modification in PACTRACK_ETC_DIR/dependencymods into
+	an in-memory index, reusing the parsed copy cached in PACTRACK_LIB_DIR if 
+	the directory has not changed since it was written.
+	Files are named after the package they apply to, or hold a rule covering 
+	several packages: a name containing '*', '?' or '[' is a glob pattern, and
+	a name starting with 're:' is a regular expression matching whole package
+	names.
+	Returns the index
+	"""
+	global dependencyModsIndex
+	if dependencyModsIndex is not None:
+		return dependencyModsIndex
+	modsPath = PACTRACK_ETC_DIR+"/dependencymods"
+	cacheFilename = PACTRACK_LIB_DIR+"/dependencymods.json"
+	fingerprint = getDependencyModsDirectoryFingerprint(modsPath)
+	packages = {}
+	rules = []
+	cacheValid = False
+	if fingerprint != "" and os.path.isfile(cacheFilename):
+		try:
+			cacheFile = open(cacheFilename, "r")
+			cache = json.load(cacheFile)
+			cacheFile.close()
+			if cache["fingerprint"] == fingerprint:
+				debugMsg("Using cached dependency modifications from '"+cacheFilename+"'")
+				packages = cache["packages"]
+				rules = cache["rules"]
+				cacheValid = True
+		except:
+			try:
+				cacheFile.close()
+			except:
+				pass
+			debugMsg("Failed to read dependency modifications cache '"+cacheFilename+"'")
+	if not cacheValid and fingerprint != "":
+		for modsFilename in sorted(os.listdir(modsPath)):
+			if os.path.isfile(modsPath+"/"+modsFilename):
+				dependencyMods = {}
+				if readDependencyModsFile(modsPath+"/"+modsFilename, dependencyMods):
+					if modsFilename.startswith("re:"):
+						rules.append(["re", modsFilename[3:], dependencyMods])
+					elif "*" in modsFilename or "?" in modsFilename or "[" in modsFilename:
+						rules.append(["glob", modsFilename, dependencyMods])
+					else:
+						packages[modsFilename] = dependencyMods
+		if not writeFile(cacheFilename, json.dumps({"fingerprint": fingerprint, "packages": packages, "rules": rules})):
+			print("Warning: could not write dependency modifications cache '"+cacheFilename+"'")
+	compiledRules = []
+	for (ruleType, pattern, dependencyMods) in rules:
+		try:
+			if ruleType == "re":
+				compiledRules.append((re.compile(pattern), dependencyMods))
+			else:
+				compiledRules.append((re.compile(fnmatch.translate(pattern)), dependencyMods))
+		except:
+			print("Warning: ignoring invalid dependency modification rule '"+pattern+"'")
+	debugMsg("Loaded dependency modifications for "+str(len(packages))+" package(s) and "+str(len(compiledRules))+" rule(s)")
+	dependencyModsIndex = {"packages": packages, "rules": compiledRules, "resolved": {}, "fingerprint": fingerprint}
+	return dependencyModsIndex
+
+# ----------------------------------------------------------------------------
+
+def refreshDependencyMods():
+	"""
+	Discard the dependency modifications index if PACTRACK_ETC_DIR/dependencymods
+	has changed since it was loaded, so that a long-running daemon reloads it
+	"""
+	global dependencyModsIndex
+	if dependencyModsIndex is None:
+		return
+	if getDependencyModsDirectoryFingerprint(PACTRACK_ETC_DIR+"/dependencymods") != dependencyModsIndex["fingerprint"]:
+		debugMsg("Dependency modifications have changed, reloading")
+		dependencyModsIndex = None
+
+# ----------------------------------------------------------------------------
+
+def getPackageDependencyMods(pPackageName, pDependencyMods):
+	"""
+	Construct a list of user-specified changes to dependencies for a given 
+	package. Changes from a file named after the package take precedence over 
+	changes from matching rules.
+	Arguments:
+		pPackageName					--	the package to find configuration for
+		pDependencyMods	(out)	--	the list of changes required, if any	
+	Returns true if there are modifications and they were read successfully
+	"""
+	index = loadDependencyMods()
+	if pPackageName not in index["resolved"]:
+		dependencyMods = None
+		if pPackageName in index["packages"]:
+			dependencyMods = dict(index["packages"][pPackageName])
+		for (pattern, ruleMods) in index["rules"]:
+			if pattern.fullmatch(pPackageName):
+				if dependencyMods is None:
+					dependencyMods = {}
+				for dependency in ruleMods:
+					if dependency not in dependencyMods:
+						dependencyMods[dependency] = ruleMods[dependency]
+		index["resolved"][pPackageName] = dependencyMods
+	dependencyMods = index["resolved"][pPackageName]
+	if dependencyMods is None:
+		return False
+	debugMsg("Using dependency modifications for package '"+pPackageName+"'")
+	for dependency in dependencyMods:
+		if dependency not in pDependencyMods:
+			pDependencyMods[dependency] = dependencyMods[dependency]
+			debugMsg("Modify dependency '"+dependency+"', action: '"+dependencyMods[dependency]+"'")
+	return True
+
+# ----------------------------------------------------------------------------
+
+class PackageDesc:
+	"""
+	A parsed package description: the sections of a desc entry, in order, each
+	holding its list of values
+	"""
+	__slots__ = ("sections",)
+
+	def __init__(self):
+		self.sections = {}
+
+	def parse(self, pContents):
+		"""
+		Parse raw package description contents in a single pass
+		Arguments:
+			pContents	--	the raw description
+		Returns true if the description was parsed successfully
+		"""
+		values = None
+		for line in pContents.splitlines():
+			strippedLine = line.strip()
+			if strippedLine == "":
+				continue
+			if len(strippedLine) > 2 and strippedLine[0] == "%" and strippedLine[-1] == "%":
+				values = self.sections.setdefault(strippedLine[1:-1], [])
+			elif values is None:
+				debugMsg("Package description has a value outside of any section")
+				return False
+			else:
+				values.append(line)
+		return True
+
+	def getValue(self, pSection):
+		"""
+		Returns the first value of a section, or an empty string if there is none
+		"""
+		values = self.sections.get(pSection)
+		return values[0].strip() if values else ""
+
+	def removeSection(self, pSection):
+		"""
+		Remove a section from the description, if present
+		"""
+		self.sections.pop(pSection, None)
+
+	def applyDependencyMods(self, pDependencyMods):
+		"""
+		Apply user-specified dependency changes to the DEPENDS section and prune 
+		optional dependencies that are now hard dependencies
+		Arguments:
+			pDependencyMods	--	dependencies mapped to their action, '+' or '-'
+		"""
+		packageDeps = dict.fromkeys([dependency.strip() for dependency in self.sections.get("DEPENDS", [])], "+")
+		# This overwrites existing actions with user-specified actions and adds
+		# new (dependency, action) sets if specified
+		packageDeps.update(pDependencyMods)
+		if "DEPENDS" in self.sections:
+			self.sections["DEPENDS"] = [dependency for dependency in packageDeps if packageDeps[dependency] == "+"]
+		if "OPTDEPENDS" in self.sections:
+			optDepends = []
+			for optDependency in self.sections["OPTDEPENDS"]:
+				optPackageName = optDependency.split(":")[0].strip()
+				if packageDeps.get(optPackageName) == "+":
+					debugMsg("Removing optional dependency '"+optPackageName+"' as it is now a hard dependency")
+				else:
+					optDepends.append(optDependency)
+			self.sections["OPTDEPENDS"] = optDepends
+
+	def serialize(self):
+		"""
+		Returns the description in desc file format
+		"""
+		contents = []
+		for section in self.sections:
+			contents.append("%"+section+"%\n")
+			for value in self.sections[section]:
+				contents.append(value+"\n")
+			contents.append("\n")
+		return "".join(contents)
+
+# ----------------------------------------------------------------------------
+
+def processPackageDescText(pContents, pPackageName, pGroupList, pProcessedDesc):
+	"""
+	Process the contents of a package description, removing groups and 
+	applying user-specified rules to dependencies
+	Arguments:
+		pContents							--	the raw description
+		pPackageName		(out)	--	the name of the package according to the description
+		pGroupList			(out)	--	returns the list of groups that the package 
+														belonged to
+		pProcessedDesc	(out)	--	returns the edited description
+	Returns true if the description was changed
+	"""
+	packageDesc = PackageDesc()
+	if not packageDesc.parse(pContents):
+		debugMsg("Failed to parse package description")
+		return False
+	packageName = packageDesc.getValue("NAME")
+	# No package name: critical error
+	debugMsg("Package name according to description: '"+packageName+"'")
+	if packageName == "":
+		debugMsg("No package name found in package description");
+		return False
+
+	# Return package name (pPackageName is an array to be able to pass by ref)
+	pPackageName.append(packageName)
+
+	groups = [group.strip() for group in packageDesc.sections.get("GROUPS", [])]
+	pGroupList.extend(groups)
+	# Package will need changes to remove group membership
+	processingRequired = len(groups) > 0
+
+	# Fetch user-configured package dependency changes, if any
+	packageDepMods = {}
+	if getPackageDependencyMods(packageName, packageDepMods):
+		if len(packageDesc.sections.get("DEPENDS", [])) > 0:
+			# Package will need changes as dependencies need to be modified
+			processingRequired = True
+
+	if processingRequired:
+		packageDesc.removeSection("GROUPS")
+		packageDesc.applyDependencyMods(packageDepMods)
+		pProcessedDesc.append(packageDesc.serialize())
+		return True
+	else:
+		debugMsg("No processing required for package '"+packageName+"'")
+		return False
+
+# ----------------------------------------------------------------------------
+
+def getDescField(pContents, pSection):
+	"""
+	Find the first value of a section in raw package description contents
+	without parsing the whole description
+	Arguments:
+		pContents	--	the raw description
+		pSection	--	the section name, without the surrounding '%'
+	Returns the value, or an empty string if the section is not present
+	"""
+	header = "%"+pSection+"%\n"
+	position = pContents.find(header)
+	while position > 0 and pContents[position-1] != "\n":
+		position = pContents.find(header, position+1)
+	if position == -1:
+		return ""
+	start = position+len(header)
+	end = pContents.find("\n", start)
+	if end == -1:
+		end = len(pContents)
+	return pContents[start:end].strip()
+
+# ----------------------------------------------------------------------------
+
+def getDependencyModsFingerprint(pPackageName):
+	"""
+	Fingerprint the dependency modifications that apply to a package, so that 
+	cached results can be invalidated when they change
+	Arguments:
+		pPackageName	--	the package to fingerprint configuration for
+	Returns the fingerprint, or an empty string if there is no configuration
+	"""
+	dependencyMods = {}
+	if not getPackageDependencyMods(pPackageName, dependencyMods):
+		return ""
+	return hashlib.sha256(json.dumps(dependencyMods).encode("utf-8")).hexdigest()[:16]
+
+# ----------------------------------------------------------------------------
+
+def readDescCache(pRepository, pCache):
+	"""
+	Read the cache of processed package descriptions for a repository
+	Arguments:
+		pRepository		--	the repository the cache belongs to
+		pCache	(out)	--	cached entries by package name
+	Returns true if the cache was read successfully
+	"""
+	cacheFilename = PACTRACK_LIB_DIR+"/desccache/"+pRepository+".json"
+	if not os.path.isfile(cacheFilename):
+		debugMsg("Description cache '"+cacheFilename+"' does not exist")
+		return False
+	debugMsg("Reading description cache '"+cacheFilename+"'")
+	try:
+		cacheFile = open(cacheFilename, "r")
+		contents = json.load(cacheFile)
+		cacheFile.close()
+	except:
+		try:
+			cacheFile.close()
+		except:
+			pass
+		print("Warning: could not read description cache '"+cacheFilename+"'")
+		return False
+	if not isinstance(contents, dict) or contents.get("format") != DESC_CACHE_FORMAT:
+		debugMsg("Discarding description cache '"+cacheFilename+"' from a different PacTrack version")
+		return False
+	pCache.update(contents["packages"])
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeDescCache(pRepository, pCache, pSeenPackages):
+	"""
+	Write the cache of processed package descriptions for a repository, 
+	evicting packages that no longer exist upstream and the least recently used
+	packages beyond DESC_CACHE_SIZE
+	Arguments:
+		pRepository		--	the repository the cache belongs to
+		pCache				--	cached entries by package name
+		pSeenPackages	--	the packages present in the current database
+	Returns true if the cache was written successfully
+	"""
+	for packageName in list(pCache):
+		if packageName not in pSeenPackages:
+			debugMsg("Evicting package '"+packageName+"' from description cache")
+			del pCache[packageName]
+	# Entries are kept in least recently used order
+	excessEntries = len(pCache)-DESC_CACHE_SIZE
+	if excessEntries > 0:
+		for packageName in list(pCache)[:excessEntries]:
+			del pCache[packageName]
+	return writeFile(PACTRACK_LIB_DIR+"/desccache/"+pRepository+".json", json.dumps({"format": DESC_CACHE_FORMAT, "packages": pCache}))
+
+# ----------------------------------------------------------------------------
+
+def getPackageDescCacheKey(pContents, pCacheKey):
+	"""
+	Work out the description cache key of a package description, from its 
+	checksum (or version) and the dependency modifications that apply to it
+	Arguments:
+		pContents					--	the raw description
+		pCacheKey	(out)	--	returns the package name and the cache key
+	Returns true if the description can be cached
+	"""
+	packageName = getDescField(pContents, "NAME")
+	packageKey = getDescField(pContents, "SHA256SUM")
+	if packageKey == "":
+		packageKey = getDescField(pContents, "VERSION")
+	if packageName == "" or packageKey == "":
+		return False
+	pCacheKey.append(packageName)
+	pCacheKey.append(packageKey+"/"+getDependencyModsFingerprint(packageName))
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readCachedPackageDesc(pCache, pCacheKey, pPackageName, pGroupList, pProcessedDesc):
+	"""
+	Look up a package description in the description cache, moving it to the
+	most recently used position
+	Arguments:
+		pCache								--	description cache to use
+		pCacheKey							--	the package name and cache key
+		pPackageName		(out)	--	the name of the package
+		pGroupList			(out)	--	returns the list of groups that the package 
+														belonged to
+		pProcessedDesc	(out)	--	returns the edited description, if it was 
+														changed
+	Returns true if the description was found in the cache
+	"""
+	packageName = pCacheKey[0]
+	if packageName not in pCache or pCache[packageName]["key"] != pCacheKey[1]:
+		return False
+	debugMsg("Using cached description for package '"+packageName+"'")
+	countMetric("descCacheHits", 1)
+	cacheEntry = pCache.pop(packageName)
+	pCache[packageName] = cacheEntry
+	pPackageName.append(packageName)
+	pGroupList.extend(cacheEntry["groups"])
+	if cacheEntry["desc"] is not None:
+		pProcessedDesc.append(cacheEntry["desc"])
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeCachedPackageDesc(pCache, pCacheKey, pPackageName, pGroupList, pProcessedDesc):
+	"""
+	Store the result of processing a package description in the description 
+	cache, if the description names the package it was keyed by
+	Arguments:
+		pCache					--	description cache to use
+		pCacheKey				--	the package name and cache key
+		pPackageName		--	the name of the package according to the description
+		pGroupList			--	the list of groups that the package belonged to
+		pProcessedDesc	--	the edited description, or empty if it was not 
+											changed
+	"""
+	if len(pPackageName) > 0 and pPackageName[0] == pCacheKey[0]:
+		pCache.pop(pCacheKey[0], None)
+		pCache[pCacheKey[0]] = {"key": pCacheKey[1], "desc": pProcessedDesc[0] if len(pProcessedDesc) > 0 else None, "groups": list(pGroupList) if len(pProcessedDesc) > 0 else []}
+
+# ----------------------------------------------------------------------------
+
+def processPackageDescCached(pContents, pPackageName, pGroupList, pProcessedDesc, pCache):
+	"""
+	Process the contents of a package description, reusing the result from a 
+	previous sync if the package and its dependency modifications are unchanged
+	Arguments:
+		pContents							--	the raw description
+		pPackageName		(out)	--	the name of the package according to the description
+		pGroupList			(out)	--	returns the list of groups that the package 
+														belonged to
+		pProcessedDesc	(out)	--	returns the edited description
+		pCache								--	description cache to use, or None
+	Returns true if the description was changed
+	"""
+	countMetric("packagesScanned", 1)
+	cacheKey = []
+	if pCache is not None and getPackageDescCacheKey(pContents, cacheKey):
+		if readCachedPackageDesc(pCache, cacheKey, pPackageName, pGroupList, pProcessedDesc):
+			countMetric("descsRewritten", 1 if len(pProcessedDesc) > 0 else 0)
+			return len(pProcessedDesc) > 0
+	processed = processPackageDescText(pContents, pPackageName, pGroupList, pProcessedDesc)
+	countMetric("descsRewritten", 1 if processed else 0)
+	if len(cacheKey) > 0:
+		writeCachedPackageDesc(pCache, cacheKey, pPackageName, pGroupList, pProcessedDesc)
+	return processed
+
+# ----------------------------------------------------------------------------
+
+def processPackageDesc(pFilename, pPackageName, pGroupList, pCache):
+	"""
+	Process a specified package description file and edit it, removing groups 
+	and applying user-specified rules to dependencies
+	Arguments:
+		pFileName						--	the file to process
+		pPackageName	(out)	--	the name of the package according to the file
+		pGroupList		(out)	--	returns the list of groups that the package 
+														belonged to
+		pCache						--	description cache to use, or None
+	Returns true if descriptor file was changed successfully
+	"""
+	debugMsg("Processing package description in file '"+pFilename+"'")
+	fileContents = ""
+	processedPackageDesc = []
+	try:
+		descFile = open(pFilename, "r")
+		fileContents = descFile.read()
+		descFile.close()
+	except:
+		try:
+			descFile.close()
+		except:	
+			pass
+		debugMsg("Failed to read description file '"+pFilename+"'");
+		return False
+	if processPackageDescCached(fileContents, pPackageName, pGroupList, processedPackageDesc, pCache):
+		return writeFile(pFilename, processedPackageDesc[0])
+	else:
+		return False
+  
+# ----------------------------------------------------------------------------
+
+def addGroupMembership(pGroupList, pPackageName, pGroups):
+	"""
+	Add a package to the global group membership list
+	Arguments:
+		pGroupList	(out)	--	sets of package members by group name
+		pPackageName			--	the package to add
+		pGroups						--	the groups that the package belongs to
+	"""
+	for groupName in pGroups:
+		if groupName not in pGroupList:
+			pGroupList[groupName] = set()
+		pGroupList[groupName].add(pPackageName)
+
+# ----------------------------------------------------------------------------
+
+def initDescWorker(pDependencyModsIndex):
+	"""
+	Set up a worker process for processPackageDescBatch()
+	Arguments:
+		pDependencyModsIndex	--	the dependency modifications index loaded by
+															the parent process
+	"""
+	global dependencyModsIndex
+	importDatabaseModules()
+	dependencyModsIndex = pDependencyModsIndex
+
+# ----------------------------------------------------------------------------
+
+def processPackageDescBatch(pDescs):
+	"""
+	Process a batch of package descriptions in a worker process
+	Arguments:
+		pDescs	--	list of raw descriptions
+	Returns a list of (package name, groups, edited description) for each 
+	description, with an empty name if it could not be parsed and no edited 
+	description if it was not changed
+	"""
+	results = []
+	for contents in pDescs:
+		packageName = []
+		groupList = []
+		processedDesc = []
+		processPackageDescText(contents, packageName, groupList, processedDesc)
+		results.append((packageName[0] if len(packageName) > 0 else "", groupList, processedDesc[0] if len(processedDesc) > 0 else None))
+	return results
+
+# ----------------------------------------------------------------------------
+
+class PendingItem:
+	"""
+	An item added to a DescProcessor, held until it is passed on in order
+	"""
+	__slots__ = ("context", "size", "cacheKey", "batch", "result", "cachedName")
+
+	def __init__(self, pContext, pSize):
+		"""
+		Arguments:
+			pContext	--	passed back to the handler
+			pSize			--	bytes held in memory by the item
+		"""
+		self.context = pContext
+		self.size = pSize
+		# The cache key of a description processed by the workers, until its 
+		# result is known
+		self.cacheKey = None
+		# The worker batch future and the description's index in the batch, 
+		# once the batch has been submitted
+		self.batch = None
+		# The package name, groups and edited description (None if unchanged)
+		self.result = None
+		# A cached package to move to the most recently used position again 
+		# when the item is passed on, so that the cache is in the same order as 
+		# without workers
+		self.cachedName = None
+
+# ----------------------------------------------------------------------------
+
+class DescProcessor:
+	"""
+	Processes the package descriptions of a database in order. With 
+	DATABASE_WORKERS other than 1, descriptions missing from the description 
+	cache are handed to worker processes in batches while the database is 
+	read, and results are passed on in the order the descriptions were added,
+	so that the output is the same as processing them one by one
+	"""
+	# Descriptions per worker batch, and the items, and bytes of descriptions
+	# and buffered members, held back waiting for workers
+	batchSize = 256
+	maxPending = 8192
+	maxPendingBytes = 32*1024*1024
+
+	def __init__(self, pGroupList, pCache, pSeenPackages, pHandler):
+		"""
+		Arguments:
+			pGroupList		(out)	--	sets of package members by group name
+			pCache							--	description cache to use, or None
+			pSeenPackages	(out)	--	names of the packages in the database
+			pHandler						--	called in order for each item added, with
+															its context and the edited description (None
+															if unchanged), returning true if the edit was
+															applied
+		"""
+		self.groupList = pGroupList
+		self.cache = pCache
+		self.seenPackages = pSeenPackages
+		self.handler = pHandler
+		self.workers = DATABASE_WORKERS if DATABASE_WORKERS > 0 else os.cpu_count()
+		self.executor = None
+		self.pending = collections.deque()
+		self.pendingBytes = 0
+		self.batch = []
+		self.batchItems = []
+
+	def isPending(self):
+		"""
+		Returns true if items are waiting to be passed on
+		"""
+		return len(self.pending) > 0
+
+	def add(self, pContext, pContents, pContextSize):
+		"""
+		Add an item, processing its description if it has one
+		Arguments:
+			pContext			--	passed back to the handler
+			pContents			--	the raw description, or None for items that are 
+												only passed through in order
+			pContextSize	--	bytes held in memory by the context until it is 
+												passed on
+		"""
+		# Items without a description are only passed through in order
+		item = PendingItem(pContext, pContextSize+(len(pContents) if pContents is not None else 0))
+		if pContents is None:
+			item.result = (None, [], None)
+		elif self.workers <= 1:
+			packageName = []
+			groupList = []
+			processedDesc = []
+			processPackageDescCached(pContents, packageName, groupList, processedDesc, self.cache)
+			item.result = (packageName[0] if len(packageName) > 0 else "", groupList, processedDesc[0] if len(processedDesc) > 0 else None)
+		else:
+			countMetric("packagesScanned", 1)
+			cacheKey = []
+			packageName = []
+			groupList = []
+			processedDesc = []
+			if self.cache is not None and getPackageDescCacheKey(pContents, cacheKey) and readCachedPackageDesc(self.cache, cacheKey, packageName, groupList, processedDesc):
+				item.result = (packageName[0], groupList, processedDesc[0] if len(processedDesc) > 0 else None)
+				item.cachedName = packageName[0]
+			else:
+				item.cacheKey = cacheKey
+				self.batch.append(pContents)
+				self.batchItems.append(item)
+				if len(self.batch) >= self.batchSize:
+					self.submitBatch()
+		self.pending.append(item)
+		self.pendingBytes += item.size
+		self.passOn(self.maxPending)
+
+	def submitBatch(self):
+		"""
+		Hand the current batch of descriptions to the worker processes
+		"""
+		if len(self.batch) == 0:
+			return
+		if self.executor is None:
+			debugMsg("Starting "+str(self.workers)+" description worker process(es)")
+			self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=initDescWorker, initargs=(loadDependencyMods(),))
+		batchFuture = self.executor.submit(processPackageDescBatch, self.batch)
+		for index in range(len(self.batchItems)):
+			self.batchItems[index].batch = (batchFuture, index)
+		self.batch = []
+		self.batchItems = []
+
+	def passOn(self, pMaxPending):
+		"""
+		Pass finished items on to the handler in order
+		Arguments:
+			pMaxPending	--	wait for workers until no more than this many items,
+											and no more than maxPendingBytes, are left waiting
+		"""
+		while len(self.pending) > 0:
+			item = self.pending[0]
+			if item.cacheKey is not None:
+				withinLimits = len(self.pending) <= pMaxPending and self.pendingBytes <= self.maxPendingBytes
+				if item.batch is None:
+					# The item's batch has not been submitted yet
+					if withinLimits:
+						return
+					self.submitBatch()
+				(batchFuture, index) = item.batch
+				if withinLimits and not batchFuture.done():
+					return
+				item.result = batchFuture.result()[index]
+				(packageName, groups, processedDesc) = item.result
+				countMetric("descsRewritten", 1 if processedDesc is not None else 0)
+				if self.cache is not None and len(item.cacheKey) > 0:
+					writeCachedPackageDesc(self.cache, item.cacheKey, [packageName] if packageName != "" else [], groups, [processedDesc] if processedDesc is not None else [])
+				item.cacheKey = None
+			elif item.cachedName is not None:
+				self.cache[item.cachedName] = self.cache.pop(item.cachedName)
+			self.pending.popleft()
+			self.pendingBytes -= item.size
+			(packageName, groups, processedDesc) = item.result
+			if self.handler(item.context, processedDesc) and processedDesc is not None:
+				# If the package belongs to one or more groups, add it to the 
+				# global group membership list
+				addGroupMembership(self.groupList, packageName, groups)
+			if packageName is not None and packageName != "":
+				self.seenPackages.add(packageName)
+
+	def finish(self):
+		"""
+		Wait for every item to be passed on, and stop the worker processes
+		"""
+		self.submitBatch()
+		self.passOn(0)
+		self.close()
+
+	def close(self):
+		"""
+		Stop the worker processes, discarding any work left
+		"""
+		if self.executor is not None:
+			self.executor.shutdown(wait=True, cancel_futures=True)
+			self.executor = None
+
+# ----------------------------------------------------------------------------
+
+def processDescDatabase(pPath, pGroupList, pCache, pSeenPackages):
+	"""
+	Processes an extracted package database, in the form pPath/<package names>/desc
+	Arguments:
+		pPath									--	the location of the database
+		pGroupList		(out)	--	sets of package members by group name
+		pCache							--	description cache to use, or None
+		pSeenPackages	(out)	--	names of the packages in the database
+	Returns true if the database was processed successfully
+	"""
+	debugMsg("Processing package database at '"+pPath+"'")
+	def writeDesc(pFilename, pProcessedDesc):
+		return pProcessedDesc is not None and writeFile(pFilename, pProcessedDesc)
+	processor = DescProcessor(pGroupList, pCache, pSeenPackages, writeDesc)
+	try:
+		for directory in os.listdir(pPath):
+			if os.path.isdir(pPath+"/"+directory):	
+				if os.path.isfile(pPath+"/"+directory+"/desc"):
+					debugMsg("Processing package description in file '"+pPath+"/"+directory+"/desc'")
+					try:
+						descFile = open(pPath+"/"+directory+"/desc", "r")
+						fileContents = descFile.read()
+						descFile.close()
+					except:
+						try:
+							descFile.close()
+						except:	
+							pass
+						debugMsg("Failed to read description file '"+pPath+"/"+directory+"/desc'");
+						continue
+					processor.add(pPath+"/"+directory+"/desc", fileContents, 0)
+		processor.finish()
+	except:
+		processor.close()
+		print("Error: failed to process package database at '"+pPath+"'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def processLocalTargets(pPath, pTargets):
+	"""
+	Processes only the entries of the given packages in an extracted package
+	database, in the form pPath/<package name>-<version>/desc
+	Arguments:
+		pPath			--	the location of the database
+		pTargets	--	names of the packages to process
+	Returns true if the packages were processed successfully
+	"""
+	debugMsg("Processing "+str(len(pTargets))+" target package(s) in database at '"+pPath+"'")
+	targets = set(pTargets)
+	for directory in os.listdir(pPath):
+		# Entries are named <package name>-<pkgver>-<pkgrel>
+		if directory.rsplit("-", 2)[0] in targets:
+			if os.path.isfile(pPath+"/"+directory+"/desc"):
+				processPackageDesc(pPath+"/"+directory+"/desc", [], [], None)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def closeFiles(pOpenFiles):
+	"""
+	Close a list of file objects, ignoring any errors
+	Arguments:
+		pOpenFiles	--	the files to close, in order
+	"""
+	for openFile in pOpenFiles:
+		try:
+			openFile.close()
+		except:
+			pass
+
+# ----------------------------------------------------------------------------
+
+class CommandReader:
+	"""
+	Reads the output of a command as a file, for tarfile streams. Closing it
+	stops the command if it is still running
+	"""
+
+	def __init__(self, pCommand):
+		"""
+		Arguments:
+			pCommand	--	the command and its arguments
+		"""
+		countMetric("subprocessesSpawned", 1)
+		self.process = subprocess.Popen(pCommand, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+	def read(self, pSize=-1):
+		"""
+		Read up to pSize bytes of output, or all of it if pSize is negative
+		"""
+		return self.process.stdout.read(pSize)
+
+	def close(self):
+		"""
+		Stop the command and wait for it to exit
+		"""
+		self.process.stdout.close()
+		if self.process.poll() is None:
+			self.process.kill()
+		self.process.wait()
+
+# ----------------------------------------------------------------------------
+
+def openDatabaseArchive(pFilename, pOpenFiles):
+	"""
+	Open a package database or package archive for sequential reading, 
+	detecting gzip, bzip2, xz or zstd compression. zstd archives are read 
+	through python-zstandard if available and the zstd command otherwise
+	Arguments:
+		pFilename					--	the archive to open
+		pOpenFiles	(out)	--	file objects to close once the archive is finished
+													with, including the archive itself
+	Returns the archive, or None if it could not be opened
+	"""
+	try:
+		archiveFile = open(pFilename, "rb")
+	except:
+		debugMsg("Failed to open database archive '"+pFilename+"'")
+		return None
+	pOpenFiles.append(archiveFile)
+	try:
+		if archiveFile.read(4) == b"\x28\xb5\x2f\xfd":
+			archiveFile.seek(0)
+			if zstandard is not None:
+				reader = zstandard.ZstdDecompressor().stream_reader(archiveFile)
+			else:
+				debugMsg("Decompressing zstd compressed archive '"+pFilename+"' with the zstd command")
+				reader = CommandReader(["zstd", "-d", "-c", "-q", "--", pFilename])
+			pOpenFiles.insert(0, reader)
+			archive = tarfile.open(fileobj=reader, mode="r|")
+		else:
+			archiveFile.seek(0)
+			archive = tarfile.open(fileobj=archiveFile, mode="r|*")
+	except:
+		debugMsg("Failed to open database archive '"+pFilename+"'")
+		return None
+	pOpenFiles.insert(0, archive)
+	return archive
+
+# ----------------------------------------------------------------------------
+
+def processDatabaseArchive(pSourceFile, pDestFile, pGroupList, pCache, pSeenPackages):
+	"""
+	Rewrite a package database archive member by member, editing desc entries
+	in memory and writing an uncompressed archive
+	Arguments:
+		pSourceFile						--	the downloaded database archive
+		pDestFile							--	the processed archive to create
+		pGroupList		(out)	--	sets of package members by group name
+		pCache							--	description cache to use, or None
+		pSeenPackages	(out)	--	names of the packages in the database
+	Returns true if the database was processed successfully
+	"""
+	debugMsg("Processing package database archive '"+pSourceFile+"'")
+	openFiles = []
+	sourceArchive = openDatabaseArchive(pSourceFile, openFiles)
+	if sourceArchive is None:
+		closeFiles(openFiles)
+		return False
+	try:
+		destArchive = tarfile.open(pDestFile, "w", format=tarfile.GNU_FORMAT)
+	except:
+		closeFiles(openFiles)
+		debugMsg("Failed to create database archive '"+pDestFile+"'")
+		return False
+	openFiles.insert(0, destArchive)
+	def writeMember(pMember, pProcessedDesc):
+		(member, memberFile) = pMember
+		if pProcessedDesc is not None:
+			contents = pProcessedDesc.encode("utf-8", "surrogateescape")
+			member.size = len(contents)
+			memberFile = io.BytesIO(contents)
+		destArchive.addfile(member, memberFile)
+		return True
+	processor = DescProcessor(pGroupList, pCache, pSeenPackages, writeMember)
+	openFiles.insert(0, processor)
+	try:
+		for member in sourceArchive:
+			if member.isfile():
+				memberFile = sourceArchive.extractfile(member)
+				if os.path.basename(member.name) == "desc":
+					contents = memberFile.read()
+					debugMsg("Processing package description '"+member.name+"'")
+					processor.add((member, io.BytesIO(contents)), contents.decode("utf-8", "surrogateescape"), len(contents))
+				elif processor.isPending():
+					# Members held back behind descriptions being processed must be
+					# read before the archive moves on, and count towards the 
+					# processor's memory limit
+					processor.add((member, io.BytesIO(memberFile.read())), None, member.size)
+				else:
+					processor.add((member, memberFile), None, 0)
+			else:
+				processor.add((member, None), None, 0)
+		processor.finish()
+		destArchive.close()
+	except:
+		closeFiles(openFiles)
+		debugMsg("Failed to process database archive '"+pSourceFile+"'")
+		return False
+	closeFiles(openFiles)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readGroups(pFilename, pGroups, pGroupVersions):
+	"""
+	Reads the contents of a groups database file, parses it and returns the content
+	Arguments:
+		pFileName							--	location of the database file
+		pGroups					(out)	--	nested array of groups and members
+		pGroupVersions	(out)	--	list of groups containing current version numbers 
+	Returns true if groups were read successfully
+	"""
+	if os.path.isfile(pFilename):
+		debugMsg("Reading groups database '"+pFilename+"'")
+		try:
+			groupsFile = open(pFilename, "r")
+			groupName = ""
+			for line in groupsFile:
+				line = line.replace("\n", "").strip()
+				if line != "":
+					if line.upper().startswith("G:"):
+						groupVersion = line.split(":",2)[1]
+						groupName = line.split(":",2)[2]
+						if groupVersion != "":
+							try:
+								pGroupVersions[groupName] = int(groupVersion)
+							except:
+								print("Warning: could not parse group line '"+line+"' in database '"+pFilename+"'")
+								# Force entire group to fail
+								groupName = ""
+						else:
+							# Force entire group to fail
+							groupName = ""
+					elif line.upper().startswith("D:"):
+						if groupName != "":
+							repository = line.split(":",2)[1].strip()
+							packageName = line.split(":",2)[2].strip()
+							if repository != "" and packageName != "":
+								if groupName not in pGroups:
+									pGroups[groupName] = {}
+								if repository not in pGroups[groupName]:
+									pGroups[groupName][repository] = [packageName]
+								else:
+									pGroups[groupName][repository].append(packageName)
+							else:
+								print("Warning: could not parse dependency line '"+line+"' in database '"+pFilename+"'")
+						else:
+							print("Warning: dependency '"+line+"' is not part of a group in database '"+pFilename+"'")
+					else:
+						print("Warning: could not parse line '"+line+"' in database '"+pFilename+"'")
+			groupsFile.close()
+			for groupName in pGroups:
+				for repository in pGroups[groupName]:
+					pGroups[groupName][repository].sort()	
+			return True
+		except:
+			try:
+				groupsFile.close()
+			except:
+				pass
+			debugMsg("Failed to read group database file '"+pFilename+"'")
+			return False
+	else:
+		debugMsg("Group database file '"+pFilename+"' does not exist")
+		return False
+
+# ----------------------------------------------------------------------------
+
+def openGroupsStore():
+	"""
+	Open the groups store in PACTRACK_LIB_DIR, creating it if required and 
+	importing an existing groups.db text database into it the first time
+	Returns the store, or None if it could not be opened
+	"""
+	global groupsStore
+	if groupsStore is not None:
+		return groupsStore
+	storeFilename = PACTRACK_LIB_DIR+"/groups.sqlite"
+	debugMsg("Opening groups store '"+storeFilename+"'")
+	try:
+		# The daemon uses the store from each request's thread in turn
+		store = sqlite3.connect(storeFilename, check_same_thread=False)
+		with store:
+			newDigests = store.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'groupdigests'").fetchone()[0] == 0
+			store.execute("CREATE TABLE IF NOT EXISTS groups (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+			store.execute("CREATE TABLE IF NOT EXISTS members (groupname TEXT NOT NULL, repository TEXT NOT NULL, package TEXT NOT NULL, PRIMARY KEY (groupname, repository, package))")
+			store.execute("CREATE INDEX IF NOT EXISTS members_repository ON members (repository, groupname)")
+			# Reverse index, to find the groups a changed package belonged to
+			store.execute("CREATE INDEX IF NOT EXISTS members_package ON members (repository, package)")
+			# Digest of each group's members in a repository, and of the 
+			# dependency modifications applied to them
+			store.execute("CREATE TABLE IF NOT EXISTS groupdigests (repository TEXT NOT NULL, groupname TEXT NOT NULL, digest TEXT NOT NULL, mods TEXT, PRIMARY KEY (repository, groupname))")
+			# Groups changed in any repository since their metapackages were built
+			store.execute("CREATE TABLE IF NOT EXISTS pendinggroups (name TEXT PRIMARY KEY)")
+			# Random identity of the store, recorded with each processed database,
+			# so that the groups of unchanged databases are recorded again in a 
+			# store that has been reset
+			store.execute("CREATE TABLE IF NOT EXISTS storeid (id TEXT NOT NULL)")
+			if store.execute("SELECT COUNT(*) FROM storeid").fetchone()[0] == 0:
+				store.execute("INSERT INTO storeid (id) VALUES (?)", (os.urandom(16).hex(),))
+	except:
+		print("Error: failed to open groups store '"+storeFilename+"'")
+		return None
+	if newDigests and not indexGroupDigests(store):
+		store.close()
+		return None
+	if os.path.isfile(PACTRACK_LIB_DIR+"/groups.db"):
+		if not importGroupsFile(store, PACTRACK_LIB_DIR+"/groups.db"):
+			store.close()
+			return None
+	if daemonRunning:
+		groupsStore = store
+	return store
+
+# ----------------------------------------------------------------------------
+
+def closeGroupsStore(pStore):
+	"""
+	Close the groups store, unless the daemon is keeping it open
+	Arguments:
+		pStore	--	the store, or None to close the store kept by the daemon
+	"""
+	global groupsStore
+	if pStore is None:
+		pStore = groupsStore
+	if pStore is None or (daemonRunning and pStore is groupsStore):
+		return
+	if pStore is groupsStore:
+		groupsStore = None
+	pStore.close()
+
+# ----------------------------------------------------------------------------
+
+def importGroupsFile(pStore, pFilename):
+	"""
+	Import a groups.db text database into an empty groups store, renaming it 
+	to <name>.imported afterwards
+	Arguments:
+		pStore		--	the groups store
+		pFilename	--	the groups database file to import
+	Returns true if the file was imported, or did not need importing
+	"""
+	try:
+		if pStore.execute("SELECT COUNT(*) FROM groups").fetchone()[0] > 0:
+			debugMsg("Not importing '"+pFilename+"': groups store is not empty")
+			return True
+	except:
+		print("Error: failed to read groups store")
+		return False
+	groups = {}
+	groupVersions = {}
+	if not readGroups(pFilename, groups, groupVersions):
+		print("Error: failed to read group database '"+pFilename+"' for import")
+		return False
+	print("Importing group database '"+pFilename+"'")
+	try:
+		with pStore:
+			for groupName in groupVersions:
+				pStore.execute("INSERT INTO groups (name, version) VALUES (?, ?)", (groupName, groupVersions[groupName]))
+			for groupName in groups:
+				for repository in groups[groupName]:
+					pStore.executemany("INSERT OR IGNORE INTO members (groupname, repository, package) VALUES (?, ?, ?)", [(groupName, repository, packageName) for packageName in groups[groupName][repository]])
+		os.rename(pFilename, pFilename+".imported")
+	except:
+		print("Error: failed to import group database '"+pFilename+"'")
+		return False
+	return indexGroupDigests(pStore)
+
+# ----------------------------------------------------------------------------
+
+def getGroupDigest(pMembers):
+	"""
+	Digest the members of a group in a repository
+	Arguments:
+		pMembers	--	sorted list of members
+	Returns the digest
+	"""
+	return hashlib.sha256("\n".join(pMembers).encode("utf-8")).hexdigest()[:16]
+
+# ----------------------------------------------------------------------------
+
+def indexGroupDigests(pStore):
+	"""
+	Add member digests for the groups in the groups store that do not have 
+	one, such as those written by an earlier PacTrack version or imported. 
+	Their dependency modifications are not known, so the groups are compared 
+	in full the next time their repository is processed
+	Arguments:
+		pStore	--	the groups store
+	Returns true if the digests were added
+	"""
+	groups = {}
+	try:
+		for (repository, groupName, packageName) in pStore.execute("SELECT repository, groupname, package FROM members WHERE NOT EXISTS (SELECT 1 FROM groupdigests WHERE groupdigests.repository = members.repository AND groupdigests.groupname = members.groupname) ORDER BY repository, groupname, package"):
+			if (repository, groupName) not in groups:
+				groups[(repository, groupName)] = []
+			groups[(repository, groupName)].append(packageName)
+		if len(groups) > 0:
+			debugMsg("Indexing "+str(len(groups))+" group(s) in groups store")
+			with pStore:
+				pStore.executemany("INSERT INTO groupdigests (repository, groupname, digest, mods) VALUES (?, ?, ?, NULL)", [(repository, groupName, getGroupDigest(groups[(repository, groupName)])) for (repository, groupName) in groups])
+	except:
+		print("Error: failed to index groups in groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readRepositoryGroupDigests(pStore, pRepository, pDigests):
+	"""
+	Read the digests of the groups with members in a given repository from the
+	groups store
+	Arguments:
+		pStore					--	the groups store
+		pRepository			--	the repository to read groups for
+		pDigests	(out)	--	(member digest, dependency modifications 
+											fingerprint) by group name
+	Returns true if the digests were read successfully
+	"""
+	try:
+		for (groupName, digest, mods) in pStore.execute("SELECT groupname, digest, mods FROM groupdigests WHERE repository = ?", (pRepository,)):
+			pDigests[groupName] = (digest, mods)
+	except:
+		debugMsg("Failed to read group digests for repository '"+pRepository+"' from groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readPackageGroups(pStore, pRepository, pPackages, pGroups):
+	"""
+	Look up the groups that packages in a repository belonged to when the 
+	groups store was last written
+	Arguments:
+		pStore				--	the groups store
+		pRepository		--	the repository the packages are in
+		pPackages			--	the packages to look up
+		pGroups	(out)	--	set of group names
+	Returns true if the groups were read successfully
+	"""
+	try:
+		for packageName in pPackages:
+			for (groupName,) in pStore.execute("SELECT groupname FROM members WHERE repository = ? AND package = ?", (pRepository, packageName)):
+				pGroups.add(groupName)
+	except:
+		debugMsg("Failed to read package groups for repository '"+pRepository+"' from groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readGroup(pStore, pGroupName, pMembers):
+	"""
+	Look up the current version and members of a group in the groups store
+	Arguments:
+		pStore					--	the groups store
+		pGroupName			--	the group to look up
+		pMembers	(out)	--	sorted member lists by repository
+	Returns the group version, 0 if the group is not in the store or -1 if the
+	lookup failed
+	"""
+	try:
+		row = pStore.execute("SELECT version FROM groups WHERE name = ?", (pGroupName,)).fetchone()
+		for (repository, packageName) in pStore.execute("SELECT repository, package FROM members WHERE groupname = ? ORDER BY repository, package", (pGroupName,)):
+			if repository not in pMembers:
+				pMembers[repository] = []
+			pMembers[repository].append(packageName)
+	except:
+		debugMsg("Failed to read group '"+pGroupName+"' from groups store")
+		return -1
+	return 0 if row is None else row[0]
+
+# ----------------------------------------------------------------------------
+
+def writeGroupChanges(pStore, pRepository, pGroups, pGroupDigests):
+	"""
+	Replace the members of changed groups in a repository and their digests,
+	and mark the groups as pending a build, in a single transaction
+	Arguments:
+		pStore					--	the groups store
+		pRepository			--	the repository the members belong to
+		pGroups					--	new member lists by group name, empty for 
+												removed groups
+		pGroupDigests		--	new (member digest, dependency modifications 
+												fingerprint) by group name
+	Returns true if the changes were committed
+	"""
+	debugMsg("Writing "+str(len(pGroups))+" changed group(s) to groups store")
+	try:
+		with pStore:
+			for groupName in pGroups:
+				pStore.execute("DELETE FROM members WHERE groupname = ? AND repository = ?", (groupName, pRepository))
+				pStore.executemany("INSERT OR IGNORE INTO members (groupname, repository, package) VALUES (?, ?, ?)", [(groupName, pRepository, packageName) for packageName in pGroups[groupName]])
+				if len(pGroups[groupName]) == 0:
+					pStore.execute("DELETE FROM groupdigests WHERE repository = ? AND groupname = ?", (pRepository, groupName))
+				pStore.execute("INSERT OR IGNORE INTO pendinggroups (name) VALUES (?)", (groupName,))
+			for groupName in pGroupDigests:
+				pStore.execute("INSERT OR REPLACE INTO groupdigests (repository, groupname, digest, mods) VALUES (?, ?, ?, ?)", (pRepository, groupName, pGroupDigests[groupName][0], pGroupDigests[groupName][1]))
+	except:
+		print("Error: failed to write changed groups to groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readGroupsStoreId(pStore):
+	"""
+	Read the identity of the groups store
+	Arguments:
+		pStore	--	the groups store
+	Returns the identity, or None if it could not be read
+	"""
+	try:
+		return pStore.execute("SELECT id FROM storeid").fetchone()[0]
+	except:
+		debugMsg("Failed to read identity of groups store")
+		return None
+
+# ----------------------------------------------------------------------------
+
+def markAllGroupsPending(pStore):
+	"""
+	Mark every group with members in any repository as changed, so that all 
+	of their metapackages are built again
+	Arguments:
+		pStore	--	the groups store
+	Returns true if the groups were marked
+	"""
+	try:
+		with pStore:
+			pStore.execute("INSERT OR IGNORE INTO pendinggroups (name) SELECT DISTINCT groupname FROM members")
+	except:
+		print("Error: failed to mark groups as changed in groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def readPendingGroups(pStore, pGroups):
+	"""
+	Read the groups that have changed since their metapackages were last built
+	Arguments:
+		pStore				--	the groups store
+		pGroups	(out)	--	list of group names
+	Returns true if the groups were read successfully
+	"""
+	try:
+		for (groupName,) in pStore.execute("SELECT name FROM pendinggroups ORDER BY name"):
+			pGroups.append(groupName)
+	except:
+		debugMsg("Failed to read pending groups from groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeGroupVersions(pStore, pGroupVersions, pBuiltGroups):
+	"""
+	Write the versions of built metapackages and clear the groups that were 
+	built or removed from the pending groups, in a single transaction
+	Arguments:
+		pStore					--	the groups store
+		pGroupVersions	--	new versions by group name
+		pBuiltGroups		--	the groups that are no longer pending
+	Returns true if the changes were committed
+	"""
+	try:
+		with pStore:
+			for groupName in pGroupVersions:
+				pStore.execute("INSERT OR REPLACE INTO groups (name, version) VALUES (?, ?)", (groupName, pGroupVersions[groupName]))
+			pStore.executemany("DELETE FROM pendinggroups WHERE name = ?", [(groupName,) for groupName in pBuiltGroups])
+	except:
+		print("Error: failed to write group versions to groups store")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def addInventoryFile(pInventory, pFilename):
+	"""
+	Add a file to a package inventory if it is a package file, with any 
+	compression extension, or a package signature
+	Arguments:
+		pInventory	(out)	--	sets of filenames by package name
+		pFilename				--	the filename to add
+	Returns the package name, or None if the file is not a package file
+	"""
+	matchObj = re.match(r'^(.+)-[^-]+-[^-]+-[^-]+\.pkg\.tar(\.[A-Za-z0-9]+)?(\.sig)?$', pFilename)
+	if not matchObj:
+		return None
+	pInventory.setdefault(matchObj.group(1), set()).add(pFilename)
+	return matchObj.group(1)
+
+# ----------------------------------------------------------------------------
+
+def readPackageInventory(pPath, pInventory):
+	"""
+	Index the package files in a directory by package name
+	Arguments:
+		pPath						--	the directory to index
+		pInventory	(out)	--	sets of filenames by package name
+	Returns true if the directory was read
+	"""
+	try:
+		entries = list(os.scandir(pPath))
+	except:
+		debugMsg("Failed to list package directory '"+pPath+"'")
+		return False
+	for entry in entries:
+		if entry.is_file():
+			addInventoryFile(pInventory, entry.name)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def removePackageFiles(pInventory, pPackageName, pKeepFile):
+	"""
+	Remove the files of a package from the metapackage repository and its 
+	inventory
+	Arguments:
+		pInventory	(out)	--	the repository inventory
+		pPackageName		--	the package to remove files for
+		pKeepFile				--	a package file to keep with its signature, or None
+	Returns true if the files were removed without error
+	"""
+	returnCode = True
+	for packageFile in sorted(pInventory.get(pPackageName, set())):
+		if pKeepFile is not None and packageFile in [pKeepFile, pKeepFile+".sig"]:
+			continue
+		print("Warning: removing existing package file '"+packageFile+"'")
+		try:
+			os.unlink(META_REPOSITORY+"/"+packageFile)
+			pInventory[pPackageName].discard(packageFile)
+		except:
+			print("Error: failed to remove existing package file '"+packageFile+"'")
+			returnCode = False
+	return returnCode
+
+# ----------------------------------------------------------------------------
+
+def readRepositoryDatabase(pFilename, pEntries):
+	"""
+	Read a repository database into memory
+	Arguments:
+		pFilename				--	the database archive to read
+		pEntries	(out)	--	package entries by package name, each holding the 
+												entry directory name and its members' contents
+	Returns true if the database was read successfully
+	"""
+	if not os.path.isfile(pFilename):
+		debugMsg("Repository database '"+pFilename+"' does not exist")
+		return True
+	debugMsg("Reading repository database '"+pFilename+"'")
+	openFiles = []
+	archive = openDatabaseArchive(pFilename, openFiles)
+	if archive is None:
+		closeFiles(openFiles)
+		return False
+	directories = {}
+	try:
+		for member in archive:
+			if member.isfile() and "/" in member.name:
+				(directory, memberName) = member.name.split("/", 1)
+				if directory not in directories:
+					directories[directory] = {}
+				directories[directory][memberName] = archive.extractfile(member).read()
+	except:
+		closeFiles(openFiles)
+		debugMsg("Failed to read repository database '"+pFilename+"'")
+		return False
+	closeFiles(openFiles)
+	for directory in directories:
+		if "desc" in directories[directory]:
+			packageName = getDescField(directories[directory]["desc"].decode("utf-8", "surrogateescape"), "NAME")
+			if packageName != "":
+				pEntries[packageName] = {"directory": directory, "members": directories[directory]}
+	return True
+
+
+def addRepositoryPackage(pEntries, pPackageFile):
+	"""
+	Add or replace a package in an in-memory repository database, in the same
+	form that repo-add would write
+	Arguments:
+		pEntries	(out)	--	package entries by package name
+		pPackageFile		--	the package archive to add
+	Returns true if the package was added successfully
+	"""
+	debugMsg("Adding package '"+pPackageFile+"' to repository database")
+	openFiles = []
+	archive = openDatabaseArchive(pPackageFile, openFiles)
+	if archive is None:
+		closeFiles(openFiles)
+		return False
+	pkgInfo = {}
+	try:
+		for member in archive:
+			if member.name == ".PKGINFO":
+				for line in archive.extractfile(member).read().decode("utf-8").splitlines():
+					if line != "" and not line.startswith("#") and " = " in line:
+						(key, value) = line.split(" = ", 1)
+						if key not in pkgInfo:
+							pkgInfo[key] = []
+						pkgInfo[key].append(value)
+				break
+	except:
+		closeFiles(openFiles)
+		debugMsg("Failed to read package information from '"+pPackageFile+"'")
+		return False
+	closeFiles(openFiles)
+	if "pkgname" not in pkgInfo or "pkgver" not in pkgInfo:
+		debugMsg("No package information found in '"+pPackageFile+"'")
+		return False
+	try:
+		packageFile = open(pPackageFile, "rb")
+		packageContents = packageFile.read()
+		packageFile.close()
+	except:
+		debugMsg("Failed to read package '"+pPackageFile+"'")
+		return False
+	pkgInfo["filename"] = [os.path.basename(pPackageFile)]
+	pkgInfo["csize"] = [str(len(packageContents))]
+	pkgInfo["md5sum"] = [hashlib.md5(packageContents).hexdigest()]
+	pkgInfo["sha256sum"] = [hashlib.sha256(packageContents).hexdigest()]
+	desc = ""
+	for (key, section) in REPOSITORY_DESC_SECTIONS:
+		if key in pkgInfo:
+			desc += "%"+section+"%\n"+"\n".join(pkgInfo[key])+"\n\n"
+	packageName = pkgInfo["pkgname"][0]
+	pEntries[packageName] = {"directory": packageName+"-"+pkgInfo["pkgver"][0], "members": {"desc": desc.encode("utf-8"), "files": b"%FILES%\n"}}
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeRepositoryDatabase(pRepositoryDir, pEntries):
+	"""
+	Write the .db and .files archives (and their symlinks) of the metapackage 
+	repository in a single pass, replacing each atomically
+	Arguments:
+		pRepositoryDir	--	the directory to write the repository database to
+		pEntries				--	package entries by package name
+	Returns true if the database was written successfully
+	"""
+	for databaseType in ["db", "files"]:
+		databaseFilename = META_REPOSITORY_NAME+"."+databaseType+".tar.gz"
+		debugMsg("Writing repository database '"+pRepositoryDir+"/"+databaseFilename+"'")
+		try:
+			archive = tarfile.open(pRepositoryDir+"/"+databaseFilename+".tmp", "w:gz", format=tarfile.PAX_FORMAT)
+			for packageName in sorted(pEntries):
+				directory = pEntries[packageName]["directory"]
+				member = tarfile.TarInfo(directory)
+				member.type = tarfile.DIRTYPE
+				member.mode = 0o755
+				member.mtime = int(time.time())
+				archive.addfile(member)
+				for memberName in sorted(pEntries[packageName]["members"]):
+					if databaseType == "files" or memberName != "files":
+						addArchiveMember(archive, directory+"/"+memberName, pEntries[packageName]["members"][memberName], int(time.time()))
+			archive.close()
+			os.replace(pRepositoryDir+"/"+databaseFilename+".tmp", pRepositoryDir+"/"+databaseFilename)
+		except:
+			try:
+				archive.close()
+			except:
+				pass
+			print("Error: failed to write repository database '"+pRepositoryDir+"/"+databaseFilename+"'")
+			return False
+		linkName = pRepositoryDir+"/"+META_REPOSITORY_NAME+"."+databaseType
+		if not (os.path.islink(linkName) and os.readlink(linkName) == databaseFilename):
+			if not publishSymlink(databaseFilename, linkName):
+				print("Error: failed to create symlink '"+linkName+"'")
+				return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def buildMetaPackage(pGroupName, pVersion, pDependencies, pUid, pGid):
+	"""
+	Build the metapackage for a group in its own directory under TEMP_DIR/build
+	Arguments:
+		pGroupName		--	the group to build a metapackage for
+		pVersion			--	the metapackage version
+		pDependencies	--	list of dependencies for the metapackage
+		pUid					--	the user to build as (makepkg builder only)
+		pGid					--	the group to build as (makepkg builder only)
+	Returns true if the metapackage was built successfully
+	"""
+	buildDir = TEMP_DIR+"/build/meta-"+pGroupName
+	# Set up build environment
+	if not directoryRequired(buildDir, True):
+		return False
+	# Create the PKGBUILD
+	if not createMetaPKGBUILD(buildDir+"/PKGBUILD", "meta-"+pGroupName, pVersion, pGroupName, pDependencies):
+		return False
+	if METAPACKAGE_BUILDER == "native":
+		if not createMetaPackage(buildDir, "meta-"+pGroupName, pVersion, pGroupName, pDependencies):
+			return False
+		countMetric("metapackagesBuilt", 1)
+		return True
+	try:
+		# change build directory ownership to "nobody" so that makepkg has permissions
+		os.chown(buildDir, pUid, pGid)
+	except:
+		debugMsg("Failed to change ownership of build directory '"+buildDir+"'")
+		return False
+	packageDigest = getMetaPackageDigest("meta-"+pGroupName, pGroupName, pDependencies)
+	if METAPACKAGE_CACHE_SIZE > 0 and restoreCachedMetaPackage(packageDigest, buildDir, "meta-"+pGroupName, pVersion):
+		countMetric("metapackagesReused", 1)
+		return True
+	# Build the package
+	if not runCommand("sudo -u nobody /usr/bin/makepkg --nodeps", buildDir, True):
+		return False
+	countMetric("metapackagesBuilt", 1)
+	if METAPACKAGE_CACHE_SIZE > 0 and not storeCachedMetaPackage(packageDigest, buildDir, "meta-"+pGroupName):
+		print("Warning: could not cache metapackage 'meta-"+pGroupName+"'")
+	return True
+
+# ----------------------------------------------------------------------------
+
+def getMetaPackageDigest(pPackageName, pGroupName, pDependencies):
+	"""
+	Digest everything a metapackage is built from except its version
+	Arguments:
+		pPackageName 	-- ArchLinux package name
+		pGroupName		-- Pacman group that the package represents
+		pDependencies	-- List of dependencies for the meta package
+	Returns the digest
+	"""
+	return hashlib.sha256(json.dumps([pPackageName, pGroupName, pDependencies]).encode("utf-8")).hexdigest()
+
+# ----------------------------------------------------------------------------
+
+def restoreCachedMetaPackage(pDigest, pBuildDir, pPackageName, pVersion):
+	"""
+	Place a cached metapackage with the given digest in a build directory, 
+	re-versioning it if it was built with a different version
+	Arguments:
+		pDigest				--	the metapackage digest
+		pBuildDir			--	the build directory
+		pPackageName	--	ArchLinux package name
+		pVersion			--	the metapackage version
+	Returns true if a cached metapackage was used
+	"""
+	cacheDir = PACTRACK_LIB_DIR+"/packagecache"
+	try:
+		cachedFiles = [cachedFile for cachedFile in os.listdir(cacheDir) if cachedFile.startswith(pDigest+"-")]
+	except:
+		return False
+	if len(cachedFiles) == 0:
+		return False
+	# Cached files are named <digest>-<package filename>
+	packageFilename = cachedFiles[0][len(pDigest)+1:]
+	debugMsg("Using cached metapackage '"+packageFilename+"' for '"+pPackageName+"' version "+pVersion)
+	if packageFilename.startswith(pPackageName+"-"+pVersion+"-"):
+		restored = publishFile(cacheDir+"/"+cachedFiles[0], pBuildDir+"/"+packageFilename)
+	else:
+		restored = reversionMetaPackage(cacheDir+"/"+cachedFiles[0], pBuildDir, pPackageName, pVersion)
+	if restored:
+		try:
+			# The modification time orders the cache for eviction
+			os.utime(cacheDir+"/"+cachedFiles[0], None)
+		except:
+			pass
+	return restored
+
+# ----------------------------------------------------------------------------
+
+def storeCachedMetaPackage(pDigest, pBuildDir, pPackageName):
+	"""
+	Add a built metapackage to the metapackage cache
+	Arguments:
+		pDigest				--	the metapackage digest
+		pBuildDir			--	the build directory containing the package
+		pPackageName	--	ArchLinux package name
+	Returns true if the metapackage was cached
+	"""
+	cacheDir = PACTRACK_LIB_DIR+"/packagecache"
+	builtFiles = {}
+	if not readPackageInventory(pBuildDir, builtFiles):
+		return False
+	builtPackages = [packageFile for packageFile in builtFiles.get(pPackageName, []) if not packageFile.endswith(".sig")]
+	if len(builtPackages) != 1 or not directoryRequired(cacheDir, False):
+		return False
+	# Replace a cached package for the same digest that could not be reused
+	try:
+		for cachedFile in os.listdir(cacheDir):
+			if cachedFile.startswith(pDigest+"-"):
+				os.remove(cacheDir+"/"+cachedFile)
+	except:
+		return False
+	return publishFile(pBuildDir+"/"+builtPackages[0], cacheDir+"/"+pDigest+"-"+builtPackages[0])
+
+# ----------------------------------------------------------------------------
+
+def trimMetaPackageCache():
+	"""
+	Remove the least recently used metapackages from the metapackage cache 
+	until it is no larger than METAPACKAGE_CACHE_SIZE
+	"""
+	cacheDir = PACTRACK_LIB_DIR+"/packagecache"
+	if not os.path.isdir(cacheDir):
+		return
+	cachedFiles = []
+	cacheSize = 0
+	try:
+		for cachedFile in os.listdir(cacheDir):
+			fileStat = os.stat(cacheDir+"/"+cachedFile)
+			cachedFiles.append((fileStat.st_mtime, cachedFile, fileStat.st_size))
+			cacheSize += fileStat.st_size
+	except:
+		print("Warning: could not read metapackage cache '"+cacheDir+"'")
+		return
+	cachedFiles.sort()
+	for (modificationTime, cachedFile, fileSize) in cachedFiles:
+		if cacheSize <= METAPACKAGE_CACHE_SIZE:
+			break
+		debugMsg("Evicting '"+cachedFile+"' from metapackage cache")
+		try:
+			os.remove(cacheDir+"/"+cachedFile)
+			cacheSize -= fileSize
+		except:
+			print("Warning: could not remove '"+cachedFile+"' from metapackage cache")
+
+# ----------------------------------------------------------------------------
+
+def reversionMetaPackage(pSourceFile, pBuildDir, pPackageName, pVersion):
+	"""
+	Write a copy of a metapackage archive with a new version, rewriting the 
+	version in its .PKGINFO and .BUILDINFO and their digests in its .MTREE
+	Arguments:
+		pSourceFile		--	the metapackage archive to copy
+		pBuildDir			--	the directory to write the new archive to
+		pPackageName	--	ArchLinux package name
+		pVersion			--	the new metapackage version
+	Returns true if the package is written successfully
+	"""
+	members = []
+	openFiles = []
+	archive = openDatabaseArchive(pSourceFile, openFiles)
+	if archive is None:
+		closeFiles(openFiles)
+		return False
+	try:
+		for member in archive:
+			if not member.isfile():
+				# Metapackages only contain their metadata files
+				closeFiles(openFiles)
+				debugMsg("Not re-versioning '"+pSourceFile+"': it contains '"+member.name+"'")
+				return False
+			members.append([member.name, archive.extractfile(member).read(), member.mtime])
+	except:
+		closeFiles(openFiles)
+		debugMsg("Failed to read metapackage '"+pSourceFile+"'")
+		return False
+	closeFiles(openFiles)
+	contents = dict([(name, data) for (name, data, memberTime) in members])
+	if ".PKGINFO" not in contents or ".BUILDINFO" not in contents or ".MTREE" not in contents:
+		debugMsg("Not re-versioning '"+pSourceFile+"': package metadata is missing")
+		return False
+	packageRelease = "1"
+	packageArch = "any"
+	try:
+		for name in [".PKGINFO", ".BUILDINFO"]:
+			lines = contents[name].decode("utf-8").split("\n")
+			for index in range(len(lines)):
+				if lines[index].startswith("pkgver = "):
+					packageRelease = lines[index].rsplit("-", 1)[1]
+					lines[index] = "pkgver = "+pVersion+"-"+packageRelease
+				elif lines[index].startswith("arch = "):
+					packageArch = lines[index][len("arch = "):]
+			contents[name] = "\n".join(lines).encode("utf-8")
+		# Update the size and digests of the rewritten files in the .MTREE
+		mtreeLines = gzip.decompress(contents[".MTREE"]).decode("utf-8").split("\n")
+		for index in range(len(mtreeLines)):
+			fields = mtreeLines[index].split(" ")
+			if fields[0] in ["./.PKGINFO", "./.BUILDINFO"]:
+				memberContents = contents[fields[0][2:]]
+				for fieldIndex in range(1, len(fields)):
+					if fields[fieldIndex].startswith("size="):
+						fields[fieldIndex] = "size="+str(len(memberContents))
+					elif fields[fieldIndex].startswith("md5digest="):
+						fields[fieldIndex] = "md5digest="+hashlib.md5(memberContents).hexdigest()
+					elif fields[fieldIndex].startswith("sha256digest="):
+						fields[fieldIndex] = "sha256digest="+hashlib.sha256(memberContents).hexdigest()
+				mtreeLines[index] = " ".join(fields)
+		contents[".MTREE"] = gzip.compress("\n".join(mtreeLines).encode("utf-8"), mtime=0)
+	except:
+		debugMsg("Failed to rewrite metadata of metapackage '"+pSourceFile+"'")
+		return False
+	packageFilename = pBuildDir+"/"+pPackageName+"-"+pVersion+"-"+packageRelease+"-"+packageArch+".pkg.tar.xz"
+	debugMsg("Writing re-versioned metapackage '"+packageFilename+"'")
+	try:
+		packageArchive = tarfile.open(packageFilename, "w:xz", format=tarfile.PAX_FORMAT)
+		for (name, data, memberTime) in members:
+			addArchiveMember(packageArchive, name, contents[name], memberTime)
+		packageArchive.close()
+	except:
+		try:
+			packageArchive.close()
+		except:
+			pass
+		debugMsg("Failed to write metapackage '"+packageFilename+"'")
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def processGroups(pRepository, pGroupList, pChangedPackages):
+	"""
+	Process a given list of groups in a repository, recording changed groups 
+	in the groups store for buildPendingGroups() to build
+	Arguments:
+		pRepository				--	the repository being processed
+		pGroupList				--	sets of package members by group name in the 
+													repository
+		pChangedPackages	--	packages added, changed or removed since the 
+													repository was last processed, or None to 
+													compare every group
+	Returns true if the groups were processed successfully
+	"""
+	storedDigests = {}
+	groupDigests = {}
+	groupsAffected = set()
+	groupsChanged = []
+	groupsRemoved = []
+	sortedMembers = {}
+	debugMsg("Processing groups for repository '"+pRepository+"'")
+	# Fetch the groups in this repository from the groups store
+	store = openGroupsStore()
+	if store is None:
+		return False
+	with metricsSpan("groups.read"):
+		if not readRepositoryGroupDigests(store, pRepository, storedDigests):
+			closeGroupsStore(store)
+			return False
+		# Only groups that a changed package belongs to, or belonged to, need
+		# to be compared
+		if pChangedPackages is None:
+			groupsAffected.update(pGroupList)
+		else:
+			if not readPackageGroups(store, pRepository, pChangedPackages, groupsAffected):
+				closeGroupsStore(store)
+				return False
+			for groupName in pGroupList:
+				if not pGroupList[groupName].isdisjoint(pChangedPackages):
+					groupsAffected.add(groupName)
+	# Clear groups in database and not in the current group list and mark them as changed
+	for groupName in storedDigests:
+		if groupName not in pGroupList:
+			groupsRemoved.append(groupName)
+			debugMsg("Group '"+groupName+"' no longer exists in repository '"+pRepository+"'")
+	
+	for groupName in pGroupList:
+		# Groups that are new to the store, or whose dependency modifications 
+		# have changed, are compared as well
+		modsFingerprint = getDependencyModsFingerprint("meta-"+groupName)
+		if storedDigests.get(groupName, (None, None))[1] != modsFingerprint:
+			groupsAffected.add(groupName)
+		if groupName not in groupsAffected:
+			continue
+		# Amend group dependencies according to user-specified configuration
+		dependencyMods = {}
+		getPackageDependencyMods("meta-"+groupName, dependencyMods)
+		for packageMod in dependencyMods:
+			if dependencyMods[packageMod] == "+":
+				if packageMod not in pGroupList[groupName]:
+					debugMsg("Adding package '"+packageMod+"' as a dependency for group '"+groupName+"'");
+					pGroupList[groupName].add(packageMod)
+			elif dependencyMods[packageMod] == "-":
+				if packageMod in pGroupList[groupName]:
+					debugMsg("Removing package '"+packageMod+"' as a dependency for group '"+groupName+"'");
+					pGroupList[groupName].discard(packageMod)
+		# Compare the group against the store by digest
+		sortedMembers[groupName] = sorted(pGroupList[groupName])
+		groupDigest = getGroupDigest(sortedMembers[groupName])
+		if groupDigest != storedDigests.get(groupName, (None, None))[0]:
+			groupsChanged.append(groupName)
+			debugMsg("Group '"+groupName+"' has changed")
+		if (groupDigest, modsFingerprint) != storedDigests.get(groupName):
+			groupDigests[groupName] = (groupDigest, modsFingerprint)
+
+	countMetric("groupsAffected", len(groupsAffected))
+	countMetric("groupsRemoved", len(groupsRemoved))
+	countMetric("groupsChanged", len(groupsChanged))
+	# Only changed groups are written
+	changedGroups = {}
+	for groupName in groupsRemoved:
+		changedGroups[groupName] = []
+	for groupName in groupsChanged:
+		changedGroups[groupName] = sortedMembers[groupName]
+	with metricsSpan("groups.write"):
+		returnCode = writeGroupChanges(store, pRepository, changedGroups, groupDigests)
+	closeGroupsStore(store)
+	return returnCode
+
+# ----------------------------------------------------------------------------
+
+def buildPendingGroups(pFailedGroups):
+	"""
+	Build the metapackages of the groups changed in any repository since they 
+	were last built, with their members from every repository, so that each 
+	metapackage is built once per sync however many repositories changed it
+	Arguments:
+		pFailedGroups	(out)	--	the groups left pending if the metapackages were 
+													not built
+	Returns true if the metapackages were built, or none were pending
+	"""
+	# The repository is only changed once every metapackage has been built: 
+	# new packages are published first, then the database is replaced 
+	# atomically, and only then are superseded package files removed
+	pendingGroups = []
+	groupVersions = {}
+	groupMembers = {}
+	groupsChanged = []
+	groupsRemoved = []
+	store = openGroupsStore()
+	if store is None:
+		return False
+	# A metapackage repository that has been reset gets every metapackage back
+	if not os.path.isfile(META_REPOSITORY+"/"+META_REPOSITORY_NAME+".db.tar.gz"):
+		debugMsg("Repository database '"+META_REPOSITORY+"/"+META_REPOSITORY_NAME+".db.tar.gz' does not exist, building every metapackage")
+		if not markAllGroupsPending(store):
+			closeGroupsStore(store)
+			return False
+	if not readPendingGroups(store, pendingGroups):
+		closeGroupsStore(store)
+		return False
+	if len(pendingGroups) == 0:
+		debugMsg("No metapackages to build")
+		closeGroupsStore(store)
+		return True
+	debugMsg("Building metapackages for "+str(len(pendingGroups))+" changed group(s)")
+	if not (directoryRequired(META_REPOSITORY, False) and directoryRequired(TEMP_DIR+"/build", True)):
+		pFailedGroups.extend(pendingGroups)
+		closeGroupsStore(store)
+		return False
+	uid = None
+	gid = None
+	if METAPACKAGE_BUILDER == "makepkg":
+		uid = pwd.getpwnam("nobody").pw_uid
+		gid = grp.getgrnam("nobody").gr_gid
+	# All additions and removals are applied to the repository database in 
+	# memory, and it is written once
+	with metricsSpan("repository.read"):
+		repositoryEntries = {}
+		if not readRepositoryDatabase(META_REPOSITORY+"/"+META_REPOSITORY_NAME+".db.tar.gz", repositoryEntries):
+			print("Error: failed to read repository database '"+META_REPOSITORY+"/"+META_REPOSITORY_NAME+".db.tar.gz'")
+			pFailedGroups.extend(pendingGroups)
+			closeGroupsStore(store)
+			return False
+		# Package files in the repository, by package name
+		inventory = {}
+		if not readPackageInventory(META_REPOSITORY, inventory):
+			pFailedGroups.extend(pendingGroups)
+			closeGroupsStore(store)
+			return False
+	buildFailure = False
+	for groupName in pendingGroups:
+		members = {}
+		groupVersion = readGroup(store, groupName, members)
+		if groupVersion < 0:
+			print("Error: failed to look up group '"+groupName+"' in groups store")
+			buildFailure = True
+		elif len(members) == 0:
+			# Groups without members in any repository are removed
+			debugMsg("Group '"+groupName+"' no longer exists")
+			groupsRemoved.append(groupName)
+			if repositoryEntries.pop("meta-"+groupName, None) is None:
+				print("Warning: failed to remove metapackage 'meta-"+groupName+"' for missing group '"+groupName+"' from repository")
+		else:
+			groupsChanged.append(groupName)
+			groupVersions[groupName] = groupVersion+1
+			# Set up list of dependencies for the metapackage
+			groupDependencies = set()
+			for repository in members:
+				groupDependencies.update(members[repository])
+			groupMembers[groupName] = sorted(groupDependencies)
+
+	# Build changed groups concurrently, each in its own build directory
+	builds = {}
+	if not buildFailure:
+		with metricsSpan("build"), concurrent.futures.ThreadPoolExecutor(max_workers=max(1, BUILD_CONCURRENCY)) as executor:
+			for groupName in groupsChanged:
+				print("Creating metapackage 'meta-"+groupName+"', version "+str(groupVersions[groupName]))
+				builds[groupName] = executor.submit(buildMetaPackage, groupName, str(groupVersions[groupName]), groupMembers[groupName], uid, gid)
+	if METAPACKAGE_BUILDER == "makepkg" and METAPACKAGE_CACHE_SIZE > 0 and len(builds) > 0:
+		trimMetaPackageCache()
+	# Update the repository database with the results, in order
+	packageFiles = {}
+	for groupName in builds:
+		if not builds[groupName].result():
+			buildFailure = True
+			print("Error: failed to build metapackage 'meta-"+groupName+"'")
+		else:
+			# The package filename depends on the builder's architecture and 
+			# compression settings
+			builtFiles = {}
+			readPackageInventory(TEMP_DIR+"/build/meta-"+groupName, builtFiles)
+			builtPackages = [packageFile for packageFile in builtFiles.get("meta-"+groupName, []) if not packageFile.endswith(".sig")]
+			if len(builtPackages) != 1:
+				buildFailure = True
+				print("Error: failed to find built package for metapackage 'meta-"+groupName+"'")
+			elif not buildFailure:
+				packageFiles[groupName] = builtPackages[0]
+				# Replace any existing package in the repository database
+				if not addRepositoryPackage(repositoryEntries, TEMP_DIR+"/build/meta-"+groupName+"/"+packageFiles[groupName]):
+					buildFailure = True
+					print("Error: failed to add metapackage 'meta-"+groupName+"' to temporary repository")
+
+	if not buildFailure:
+		with metricsSpan("repository.publish"):
+			for groupName in groupsChanged:
+				packageFilename = packageFiles[groupName]
+				if publishFile(TEMP_DIR+"/build/meta-"+groupName+"/"+packageFilename, META_REPOSITORY+"/"+packageFilename):
+					addInventoryFile(inventory, packageFilename)
+				else:
+					print("Error: failed to publish package '"+TEMP_DIR+"/build/meta-"+groupName+"/"+packageFilename+"' to '"+META_REPOSITORY+"/"+packageFilename+"'")
+					buildFailure = True
+			if not buildFailure:
+				if not writeRepositoryDatabase(META_REPOSITORY, repositoryEntries):
+					buildFailure = True
+			if not buildFailure:
+				for groupName in groupsChanged:
+					if not removePackageFiles(inventory, "meta-"+groupName, packageFiles[groupName]):
+						print("Warning: failed to remove existing packages for 'meta-"+groupName+"' in repository '"+META_REPOSITORY+"'")
+				for groupName in groupsRemoved:
+					if not removePackageFiles(inventory, "meta-"+groupName, None):
+						print("Warning: failed to remove existing packages for 'meta-"+groupName+"' in repository '"+META_REPOSITORY+"'")
+
+	if not buildFailure:
+		# Groups stay pending until their metapackages are in the repository
+		with metricsSpan("groups.write"):
+			returnCode = writeGroupVersions(store, groupVersions, pendingGroups)
+		if not returnCode:
+			pFailedGroups.extend(pendingGroups)
+		closeGroupsStore(store)
+		return returnCode
+	else:
+		print("Error: not updating repository '"+META_REPOSITORY+"' due to build failure")
+		pFailedGroups.extend(pendingGroups)
+		closeGroupsStore(store)
+		return False
+
+# ----------------------------------------------------------------------------
+
+def compressDatabase(pSourceFile, pCompressedFile):
+	"""
+	Compress a processed database archive as set by DATABASE_COMPRESSION
+	Arguments:
+		pSourceFile							--	the uncompressed archive
+		pCompressedFile	(out)	--	returns the archive to publish, which is the 
+															source archive itself if compression is disabled
+	Returns true if the archive was compressed successfully
+	"""
+	if DATABASE_COMPRESSION == "none":
+		pCompressedFile.append(pSourceFile)
+		return True
+	debugMsg("Compressing database '"+pSourceFile+"' with "+DATABASE_COMPRESSION+" level "+str(DATABASE_COMPRESSION_LEVEL))
+	if DATABASE_COMPRESSION == "gzip":
+		destFile = pSourceFile+".gz"
+		openFiles = []
+		try:
+			openFiles.append(open(pSourceFile, "rb"))
+			openFiles.insert(0, gzip.GzipFile(destFile, "wb", DATABASE_COMPRESSION_LEVEL, mtime=0))
+			shutil.copyfileobj(openFiles[1], openFiles[0], 1024*1024)
+			openFiles[0].close()
+			openFiles[1].close()
+		except:
+			closeFiles(openFiles)
+			print("Error: failed to compress database '"+pSourceFile+"'")
+			return False
+	elif DATABASE_COMPRESSION == "zstd":
+		destFile = pSourceFile+".zst"
+		if zstandard is not None:
+			openFiles = []
+			try:
+				openFiles.append(open(pSourceFile, "rb"))
+				openFiles.insert(0, open(destFile, "wb"))
+				compressor = zstandard.ZstdCompressor(level=DATABASE_COMPRESSION_LEVEL, threads=DATABASE_COMPRESSION_THREADS if DATABASE_COMPRESSION_THREADS > 0 else -1)
+				compressor.copy_stream(openFiles[1], openFiles[0])
+				openFiles[0].close()
+				openFiles[1].close()
+			except:
+				closeFiles(openFiles)
+				print("Error: failed to compress database '"+pSourceFile+"'")
+				return False
+		elif not runCommand("zstd -q -f -T"+str(DATABASE_COMPRESSION_THREADS)+" -"+str(DATABASE_COMPRESSION_LEVEL)+" -o \""+destFile+"\" \""+pSourceFile+"\"", None, True):
+			print("Error: failed to compress database '"+pSourceFile+"' with zstd")
+			return False
+	else:
+		print("Error: unknown database compression '"+DATABASE_COMPRESSION+"'")
+		return False
+	pCompressedFile.append(destFile)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def getProcessingFingerprint():
+	"""
+	Compute a fingerprint of everything besides the upstream database that
+	affects how it is processed: the dependency modifications and the output
+	settings
+	Returns the fingerprint
+	"""
+	settings = [getDependencyModsDirectoryFingerprint(PACTRACK_ETC_DIR+"/dependencymods"), DESC_CACHE_FORMAT, DATABASE_COMPRESSION, DATABASE_COMPRESSION_LEVEL, META_REPOSITORY_NAME, METAPACKAGE_BUILDER]
+	return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+# ----------------------------------------------------------------------------
+
+def hashFile(pFilename):
+	"""
+	Compute the SHA-256 digest of a file
+	Arguments:
+		pFilename	--	the file to hash
+	Returns the hex digest, or an empty string if the file could not be read
+	"""
+	digest = hashlib.sha256()
+	try:
+		hashedFile = open(pFilename, "rb")
+		for block in iter(lambda: hashedFile.read(1024*1024), b""):
+			digest.update(block)
+		hashedFile.close()
+	except:
+		debugMsg("Failed to hash file '"+pFilename+"'")
+		return ""
+	return digest.hexdigest()
+
+# ----------------------------------------------------------------------------
+
+def readRepositoryState(pArchiveName, pState):
+	"""
+	Read what is known about the last download of a repository database from 
+	PACTRACK_LIB_DIR/repositories: its URL, validators, content hash, and the
+	processing fingerprint and groups store of the processed copy kept 
+	alongside it
+	Arguments:
+		pArchiveName		--	the database name, e.g. "core" or "core.files"
+		pState	(out)	--	the state read
+	Returns true if the state was read and its processed copy exists
+	"""
+	stateFilename = PACTRACK_LIB_DIR+"/repositories/"+pArchiveName+".json"
+	if not os.path.isfile(stateFilename) or not os.path.isfile(PACTRACK_LIB_DIR+"/repositories/"+pArchiveName+".processed"):
+		return False
+	try:
+		stateFile = open(stateFilename, "r")
+		pState.update(json.load(stateFile))
+		stateFile.close()
+	except:
+		try:
+			stateFile.close()
+		except:
+			pass
+		debugMsg("Failed to read repository state '"+stateFilename+"'")
+		pState.clear()
+		return False
+	return True
+
+# ----------------------------------------------------------------------------
+
+def writeRepositoryState(pArchiveName, pState, pProcessedFile):
+	"""
+	Record the state of a processed repository database, keeping a copy of 
+	the processed database to serve while upstream is unchanged
+	Arguments:
+		pArchiveName		--	the database name, e.g. "core" or "core.files"
+		pState					--	the state to write
+		pProcessedFile	--	the processed database, or None to keep the existing 
+												copy
+	Returns true if the state was written
+	"""
+	statePath = PACTRACK_LIB_DIR+"/repositories/"+pArchiveName
+	if pProcessedFile is not None:
+		if not (directoryRequired(PACTRACK_LIB_DIR+"/repositories", False) and publishFile(pProcessedFile, statePath+".processed")):
+			return False
+	return writeFile(statePath+".json", json.dumps(pState))
+
+# ----------------------------------------------------------------------------
+
+def getDatabaseArchiveName(pOutputFile):
+	"""
+	Work out which database pacman is downloading
+	Arguments:
+		pOutputFile	--	the destination file of the database or its signature, 
+										which may have a .part extension
+	Returns the database name, e.g. "core" or "core.files"
+	"""
+	repositoryName = os.path.basename(pOutputFile).split(".", 1)[0].strip()
+	if os.path.basename(pOutputFile)[len(repositoryName):].startswith(".files"):
+		return repositoryName+".files"
+	return repositoryName
+
+# ----------------------------------------------------------------------------
+
+def probeURL(pURL, pExists):
+	"""
+	Find out whether a file exists upstream. Builtin HTTP downloads only send 
+	a HEAD request, or request the first byte of the file from servers that 
+	refuse HEAD; other downloads fetch the file to TEMP_DIR/signatures and 
+	remove it again, leaving the rest of TEMP_DIR alone
+	Arguments:
+		pURL				--	the URL to probe
+		pExists	(out)	--	returns whether the file exists
+	Returns true if the probe was answered
+	"""
+	countMetric("urlProbes", 1)
+	if DOWNLOADER == "builtin" and pURL.lower().startswith(("http://", "https://")):
+		for (method, headers) in [("HEAD", {}), ("GET", {"Range": "bytes=0-0"})]:
+			connection = []
+			response = openHTTPResponse(pURL, method, headers, connection)
+			if response is None:
+				return False
+			(scheme, host, connection, url) = connection
+			response.read()
+			releaseConnection(scheme, host, connection, response)
+			if method == "HEAD" and response.status in [403, 405, 501]:
+				debugMsg("HEAD request refused probing URL '"+pURL+"', requesting the first byte instead")
+				continue
+			break
+		# An empty file has no first byte to return (416)
+		if response.status in [200, 206, 416]:
+			pExists.append(True)
+		elif response.status in [404, 410]:
+			pExists.append(False)
+		else:
+			debugMsg("Unexpected HTTP status "+str(response.status)+" probing URL '"+pURL+"'")
+			return False
+		return True
+	probeDir = TEMP_DIR+"/signatures"
+	if not directoryRequired(probeDir, False):
+		return False
+	probeFile = probeDir+"/"+hashlib.sha256(pURL.encode("utf-8")).hexdigest()[:16]
+	pExists.append(downloadFile(pURL, probeFile, True, None))
+	try:
+		if os.path.isfile(probeFile):
+			os.remove(probeFile)
+	except:
+		debugMsg("Failed to remove probe file '"+probeFile+"'")
+	return True
+
+# ----------------------------------------------------------------------------
+
+def processSignature(pURL, pOutputFile):
+	"""
+	Answer a database signature download. Processed databases no longer match
+	upstream signatures, so no signature is supplied, but a warning is printed
+	if the repository is signed. Whether it is signed is kept in the state of 
+	the repository database, which is replaced when the database changes, so 
+	that it is only probed for again when the database has changed
+	Arguments:
+		pURL				--	the URL of the signature
+		pOutputFile	--	the destination file for the signature
+	Returns false, as the signature is never supplied
+	"""
+	archiveName = getDatabaseArchiveName(pOutputFile)
+	repositoryState = {}
+	signed = []
+	if readRepositoryState(archiveName, repositoryState) and repositoryState.get("signatureUrl") == pURL:
+		debugMsg("Using cached signature probe for '"+pURL+"'")
+		countMetric("signatureProbesCached", 1)
+		signed.append(repositoryState["signed"])
+	elif probeURL(pURL, signed) and len(repositoryState) > 0:
+		repositoryState["signatureUrl"] = pURL
+		repositoryState["signed"] = signed[0]
+		if not writeRepositoryState(archiveName, repositoryState, None):
+			print("Warning: could not write state for repository database '"+archiveName+"'")
+	if len(signed) > 0 and signed[0]:
+		print("Warning: repository is signed - ensure configuration does not require this")
+	return False
+
+# ----------------------------------------------------------------------------
+
+def processDatabase(pURL, pOutputFile):
+	"""
+	Process a database download request. File lists databases (.files) are 
+	rewritten in the same way as the matching .db, copying file lists through
+	untouched, but groups are only processed from the .db.
+	The download is conditional on the validators of the last one, and while 
+	the upstream database, processing settings and groups store are unchanged 
+	the processed copy kept from the last run is served without processing it
+	again
+	Arguments:
+		pURL				--	the remote location of the database
+		pOutputFile	--	the destination file for the database
+	Returns true if the database is successfully processed
+	"""
+	groupList = {}
+	debugMsg("Processing database from '"+pURL+"'")
+	# Ensure the environment is set up
+	if not (directoryRequired(PACTRACK_LIB_DIR, False) and directoryRequired(META_REPOSITORY, False)):
+		return False
+	if not (directoryRequired(TEMP_DIR, True) and directoryRequired(TEMP_DIR+"/database", True) and directoryRequired(TEMP_DIR+"/build", True)):
+		return False
+	# Download the database file
+	repositoryName = os.path.basename(pOutputFile).split(".", 1)[0].strip()
+	debugMsg("Repository name is '"+repositoryName+"'")
+	archiveName = getDatabaseArchiveName(pOutputFile)
+	filesDatabase = archiveName != repositoryName
+	# The groups of a .db are only in the groups store if it is the store they
+	# were recorded in; otherwise (such as after the store was reset) the 
+	# database is processed again and every group in it compared
+	groupsStoreId = None
+	if not filesDatabase:
+		store = openGroupsStore()
+		if store is None:
+			return False
+		groupsStoreId = readGroupsStoreId(store)
+		closeGroupsStore(store)
+		if groupsStoreId is None:
+			return False
+	repositoryState = {}
+	processingFingerprint = getProcessingFingerprint()
+	validators = {}
+	stateRead = readRepositoryState(archiveName, repositoryState)
+	groupsRecorded = filesDatabase or repositoryState.get("groupsStore") == groupsStoreId
+	if stateRead and groupsRecorded and repositoryState["url"] == pURL and repositoryState["fingerprint"] == processingFingerprint:
+		validators = {"etag": repositoryState["etag"], "lastModified": repositoryState["lastModified"]}
+	else:
+		repositoryState = {}
+	with metricsSpan("download"):
+		if not downloadFile(pURL, TEMP_DIR+"/"+archiveName+".tar", False, validators):
+			return False
+	if validators.get("notModified", False):
+		debugMsg("Database '"+archiveName+"' is not modified, using processed copy")
+		countMetric("databasesUnchanged", 1)
+		with metricsSpan("publish"):
+			return publishFile(PACTRACK_LIB_DIR+"/repositories/"+archiveName+".processed", pOutputFile)
+	contentHash = hashFile(TEMP_DIR+"/"+archiveName+".tar")
+	if len(repositoryState) > 0 and contentHash == repositoryState["sha256"]:
+		debugMsg("Database '"+archiveName+"' is unchanged, using processed copy")
+		countMetric("databasesUnchanged", 1)
+		repositoryState["etag"] = validators.get("etag")
+		repositoryState["lastModified"] = validators.get("lastModified")
+		if not writeRepositoryState(archiveName, repositoryState, None):
+			print("Warning: could not write state for repository database '"+archiveName+"'")
+		with metricsSpan("publish"):
+			return publishFile(PACTRACK_LIB_DIR+"/repositories/"+archiveName+".processed", pOutputFile)
+	descCache = {}
+	seenPackages = set()
+	with metricsSpan("descCache.read"):
+		readDescCache(repositoryName, descCache)
+	previousKeys = dict([(packageName, descCache[packageName]["key"]) for packageName in descCache])
+	databaseProcessed = False
+	if DATABASE_MODE == "stream":
+		# Rewrite the database archive without unpacking it
+		with metricsSpan("rewrite"):
+			databaseProcessed = processDatabaseArchive(TEMP_DIR+"/"+archiveName+".tar", TEMP_DIR+"/processed-"+archiveName+".tar", groupList, descCache, seenPackages)
+		if not databaseProcessed:
+			print("Warning: could not stream database '"+repositoryName+"', unpacking it instead")
+			groupList = {}
+			seenPackages = set()
+	if not databaseProcessed:
+		# Unpack the database file
+		debugMsg("Unpacking database '"+TEMP_DIR+"/"+archiveName+".tar' to '"+TEMP_DIR+"/database'")
+		with metricsSpan("unpack"):
+			if not runCommand("/usr/bin/tar -C "+TEMP_DIR+"/database -xvf "+TEMP_DIR+"/"+archiveName+".tar", None, True):
+				return False
+		debugMsg("Processing database '"+TEMP_DIR+"/database'")
+		with metricsSpan("rewrite"):
+			if not processDescDatabase(TEMP_DIR+"/database", groupList, descCache, seenPackages):
+				return False
+		# Re-pack the database file
+		debugMsg("Packing database '"+TEMP_DIR+"/database' to '"+TEMP_DIR+"/processed-"+archiveName+".tar'")
+		with metricsSpan("pack"):
+			if not runCommand("/usr/bin/tar --transform='s/\.\///' -cvf "+TEMP_DIR+"/processed-"+archiveName+".tar -C "+TEMP_DIR+"/database ./", None, True):
+				return False
+	if filesDatabase:
+		# The description cache and groups are maintained from the .db
+		groupsProcessed = True
+	else:
+		# Packages whose cached description was replaced, added or not seen 
+		# again have changed since the groups were last processed
+		changedPackages = set()
+		for packageName in seenPackages:
+			if packageName not in descCache or descCache[packageName]["key"] != previousKeys.get(packageName):
+				changedPackages.add(packageName)
+		for packageName in previousKeys:
+			if packageName not in seenPackages:
+				changedPackages.add(packageName)
+		countMetric("packagesChanged", len(changedPackages))
+		with metricsSpan("processGroups"):
+			groupsProcessed = processGroups(repositoryName, groupList, changedPackages if groupsRecorded else None)
+		# The cache is only updated once the groups are, so that changes are 
+		# seen again if processing the groups failed
+		if groupsProcessed:
+			with metricsSpan("descCache.write"):
+				if not writeDescCache(repositoryName, descCache, seenPackages):
+					print("Warning: could not write description cache for repository '"+repositoryName+"'")
+	if groupsProcessed:
+		compressedFile = []
+		with metricsSpan("compress"):
+			if not compressDatabase(TEMP_DIR+"/processed-"+archiveName+".tar", compressedFile):
+				return False
+		repositoryState = {"url": pURL, "etag": validators.get("etag"), "lastModified": validators.get("lastModified"), "sha256": contentHash, "fingerprint": processingFingerprint, "groupsStore": groupsStoreId}
+		publishedFile = compressedFile[0]
+		if contentHash != "" and writeRepositoryState(archiveName, repositoryState, compressedFile[0]):
+			# The kept copy is usually on the same filesystem as pacman's databases
+			publishedFile = PACTRACK_LIB_DIR+"/repositories/"+archiveName+".processed"
+		else:
+			print("Warning: could not write state for repository database '"+archiveName+"'")
+		with metricsSpan("publish"):
+			return publishFile(publishedFile, pOutputFile)
+	else:
+		return False
+
+# ----------------------------------------------------------------------------
+
+def createMetaPKGBUILD(pFileName, pPackageName, pVersion, pGroupName, pDependencies):
+	"""
+	Create a specified meta package PKGBUILD with given dependencies
+	Arguments:
+		pFileName 		-- the file to create
+		pPackageName 	-- ArchLinux package name
+		pVersion			-- ArchLinux package version
+		pGroupName		-- Pacman group that the PKGBUILD represents
+		pDependencies	-- List of dependencies for the meta package
+	Returns true if the file is created successfully
+	"""
+	contents = "pkgname="+pPackageName+"\n"
+	contents += "pkgver="+pVersion+"\n"
+	contents += "pkgrel=1\n"
+	contents += "pkgdesc=\"Metapackage for group '"+pGroupName+"' (generated by PacTrack)\"\n"
+	contents += "license=('GPL')\n"
+	contents += "arch=('x86_64')\n"
+	contents += "depends=("
+	firstDependency = True
+	for dependency in pDependencies:
+		if firstDependency:
+			firstDependency = False
+			contents += "'"+dependency+"'"
+		else:
+			contents += " '"+dependency+"'"
+	contents += ")\n"
+	contents += "package() {\n"
+	contents += "  echo null > /dev/null\n"
+	contents += "}\n"
+	return writeFile(pFileName, contents)
+	
+# ----------------------------------------------------------------------------
+
+def addArchiveMember(pArchive, pName, pContents, pTime):
+	"""
+	Add an in-memory file owned by root to a tar archive
+	Arguments:
+		pArchive	--	the archive to add to
+		pName			--	the member name
+		pContents	--	the member contents, as bytes
+		pTime			--	the modification time of the member
+	"""
+	member = tarfile.TarInfo(pName)
+	member.size = len(pContents)
+	member.mtime = pTime
+	member.mode = 0o644
+	member.uname = "root"
+	member.gname = "root"
+	pArchive.addfile(member, io.BytesIO(pContents))
+
+# ----------------------------------------------------------------------------
+
+def createMetaPackage(pBuildDir, pPackageName, pVersion, pGroupName, pDependencies):
+	"""
+	Write a metapackage archive directly, with the .PKGINFO, .BUILDINFO and 
+	.MTREE metadata that makepkg would generate for the PKGBUILD in pBuildDir
+	Arguments:
+		pBuildDir			--	the build directory containing the PKGBUILD
+		pPackageName 	-- ArchLinux package name
+		pVersion			-- ArchLinux package version
+		pGroupName		-- Pacman group that the package represents
+		pDependencies	-- List of dependencies for the meta package
+	Returns true if the package is created successfully
+	"""
+	packageFilename = pBuildDir+"/"+pPackageName+"-"+pVersion+"-1-x86_64.pkg.tar.xz"
+	debugMsg("Writing metapackage '"+packageFilename+"'")
+	buildDate = int(time.time())
+	try:
+		pkgbuildFile = open(pBuildDir+"/PKGBUILD", "rb")
+		pkgbuildHash = hashlib.sha256(pkgbuildFile.read()).hexdigest()
+		pkgbuildFile.close()
+	except:
+		debugMsg("Failed to read '"+pBuildDir+"/PKGBUILD'")
+		return False
+	pkgInfo = "# Generated by PacTrack\n"
+	pkgInfo += "pkgname = "+pPackageName+"\n"
+	pkgInfo += "pkgbase = "+pPackageName+"\n"
+	pkgInfo += "pkgver = "+pVersion+"-1\n"
+	pkgInfo += "pkgdesc = Metapackage for group '"+pGroupName+"' (generated by PacTrack)\n"
+	pkgInfo += "builddate = "+str(buildDate)+"\n"
+	pkgInfo += "packager = Unknown Packager\n"
+	pkgInfo += "size = 0\n"
+	pkgInfo += "arch = x86_64\n"
+	pkgInfo += "license = GPL\n"
+	for dependency in pDependencies:
+		pkgInfo += "depend = "+dependency+"\n"
+	buildInfo = "format = 2\n"
+	buildInfo += "pkgname = "+pPackageName+"\n"
+	buildInfo += "pkgbase = "+pPackageName+"\n"
+	buildInfo += "pkgver = "+pVersion+"-1\n"
+	buildInfo += "pkgarch = x86_64\n"
+	buildInfo += "pkgbuild_sha256sum = "+pkgbuildHash+"\n"
+	buildInfo += "packager = Unknown Packager\n"
+	buildInfo += "builddate = "+str(buildDate)+"\n"
+	buildInfo += "builddir = "+pBuildDir+"\n"
+	buildInfo += "startdir = "+pBuildDir+"\n"
+	buildInfo += "buildtool = pactrack\n"
+	buildInfo += "buildtoolver = 1\n"
+	metadata = [(".BUILDINFO", buildInfo.encode("utf-8")), (".PKGINFO", pkgInfo.encode("utf-8"))]
+	# Same layout as bsdtar's mtree output in makepkg
+	mtree = "#mtree\n/set type=file uid=0 gid=0 mode=644\n"
+	for (name, contents) in metadata:
+		mtree += "./"+name+" time="+str(buildDate)+".0 size="+str(len(contents))+" md5digest="+hashlib.md5(contents).hexdigest()+" sha256digest="+hashlib.sha256(contents).hexdigest()+"\n"
+	try:
+		packageArchive = tarfile.open(packageFilename, "w:xz", format=tarfile.PAX_FORMAT)
+		addArchiveMember(packageArchive, ".PKGINFO", metadata[1][1], buildDate)
+		addArchiveMember(packageArchive, ".BUILDINFO", metadata[0][1], buildDate)
+		addArchiveMember(packageArchive, ".MTREE", gzip.compress(mtree.encode("utf-8"), mtime=0), buildDate)
+		packageArchive.close()
+	except:
+		try:
+			packageArchive.close()
+		except:
+			pass
+		debugMsg("Failed to write metapackage '"+packageFilename+"'")
+		return False
+	return True
+	
+# ----------------------------------------------------------------------------
+
+def getLastSyncRepository():
+	"""
+	Find the last repository configured in PACMAN_CONF, other than the 
+	metapackage repository
+	Returns the repository name, or an empty string if it could not be found
+	"""
+	lastRepository = ""
+	try:
+		confFile = open(PACMAN_CONF, "r")
+		for line in confFile:
+			line = line.strip()
+			if line.startswith("[") and line.endswith("]"):
+				sectionName = line[1:-1].strip()
+				if sectionName != "options" and sectionName != META_REPOSITORY_NAME:
+					lastRepository = sectionName
+		confFile.close()
+	except:
+		print("Warning: could not read repositories from '"+PACMAN_CONF+"'")
+	return lastRepository
+
+# ----------------------------------------------------------------------------
+
+def buildSyncMetaPackages():
+	"""
+	Build the metapackages of the groups changed during a sync, reporting the 
+	groups whose metapackages could not be built
+	Returns true if the metapackages were built, or none were pending
+	"""
+	failedGroups = []
+	with metricsSpan("buildPendingGroups"):
+		if buildPendingGroups(failedGroups):
+			return True
+	if len(failedGroups) > 0:
+		print("Error: failed to build metapackages for group(s) "+", ".join(failedGroups)+"; they will be built again at the next sync")
+	else:
+		print("Error: failed to build metapackages")
+	return False
+
+# ----------------------------------------------------------------------------
+
+def processSync(pURL, pOutputFile):
+	"""
+	Process the synchronisation action
+	Arguments:
+		pURL				--	the URL to download
+		pOutputFile	--	the destination file
+	Returns true if processing is successful
+	"""
+	debugMsg("Downloading URL '"+pURL+"' to output file '"+pOutputFile+"'")
+	# Group changes from every repository are built once, before the 
+	# metapackage repository's database is handed to pacman
+	repositoryName = os.path.basename(pOutputFile).split(".", 1)[0].strip()
+	syncDatabase = pOutputFile.startswith(PACMAN_LIB_DIR+"/sync") and os.path.basename(pOutputFile)[len(repositoryName):].startswith(".db") and not pURL.endswith(".sig")
+	if pURL.upper().startswith("CP:"):
+		sourceFile = pURL.split(":", 1)[1].strip()
+		debugMsg("Copying file '"+sourceFile+"' to '"+pOutputFile+"'")
+		if pURL.endswith(".sig") and os.path.isfile(sourceFile):
+			print("Warning: repository is signed - ensure configuration does not require this")
+			return False
+		else:
+			if syncDatabase and repositoryName == META_REPOSITORY_NAME:
+				importDatabaseModules()
+				if not buildSyncMetaPackages():
+					return False
+			return publishFile(sourceFile, pOutputFile)
+	elif pOutputFile.startswith(PACMAN_LIB_DIR+"/sync"):
+		debugMsg("Intercepted database download")
+		importDatabaseModules()
+		if pURL.endswith(".sig"):
+			with metricsSpan("processSignature"):
+				return processSignature(pURL, pOutputFile)
+		else:
+			if syncDatabase and repositoryName == META_REPOSITORY_NAME:
+				if not buildSyncMetaPackages():
+					return False
+			with metricsSpan("processDatabase"):
+				returnCode = processDatabase(pURL, pOutputFile)
+			# Metapackages are still built if the metapackage repository is 
+			# listed before the others
+			if syncDatabase and repositoryName == getLastSyncRepository():
+				returnCode = buildSyncMetaPackages() and returnCode
+			return returnCode
+	else:	
+		with metricsSpan("download"):
+			return downloadFile(pURL, pOutputFile, False, None)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def runAction(pArgs, pInput):
+	"""
+	Run a single action, in-process or on behalf of a daemon client
+	Arguments:
+		pArgs		--	raw program arguments
+		pInput	--	lines read from standard input, for "LOCAL -"
+	Returns true if the action succeeded
+	"""
+	global metrics
+	returnCode = True
+	metrics = None
+	if "--metrics" in pArgs:
+		pArgs = [arg for arg in pArgs if arg != "--metrics"]
+		startMetrics(pArgs[1].upper() if len(pArgs) > 1 else "")
+	elif METRICS:
+		startMetrics(pArgs[1].upper() if len(pArgs) > 1 else "")
+	if len(pArgs) < 2:
+		print("Error: no action was specified")
+		printUsage()
+		return False
+	if pArgs[1].upper() == "LOCAL":
+		importDatabaseModules()
+		if len(pArgs) > 2 and pArgs[2] == "-":
+			# Target package names are passed on stdin by the hook (NeedsTargets)
+			targets = []
+			for line in pInput:
+				if line.strip() != "":
+					targets.append(line.strip())
+			with metricsSpan("processLocalTargets"):
+				returnCode = processLocalTargets(PACMAN_LIB_DIR+"/local", targets)
+		else:
+			groupList = {}
+			with metricsSpan("processDescDatabase"):
+				returnCode = processDescDatabase(PACMAN_LIB_DIR+"/local", groupList, None, set())
+	elif pArgs[1].upper() == "SYNC":
+		if len(pArgs) < 4:
+			print("Error: incomplete arguments supplied for this action")
+			printUsage()
+			return False
+		with metricsSpan("processSync"):
+			returnCode = processSync(pArgs[2], pArgs[3])
+	else:
+		print("Unknown action '"+pArgs[1]+"'")
+		printUsage()
+		returnCode = False
+
+	# Clean up temporary directory
+#	if os.path.isdir(TEMP_DIR):
+#		try:
+#			shutil.rmtree(TEMP_DIR)
+#		except:
+#			print("Warning: failed to clean up temporary directory '"+TEMP_DIR+"'")
+
+	writeMetrics(pArgs[2:], returnCode)
+	return returnCode
+
+# ----------------------------------------------------------------------------
+
+class DaemonOutput:
+	"""
+	Standard output of a request being run by the daemon, sent back to the 
+	client as it is written
+	"""
+	def __init__(self, pConnection):
+		self.connection = pConnection
+
+	def write(self, pText):
+		try:
+			self.connection.sendall((json.dumps({"output": pText})+"\n").encode("utf-8", "surrogateescape"))
+		except:
+			# The client has gone away, but the request is still completed
+			pass
+		return len(pText)
+
+	def flush(self):
+		pass
+
+# ----------------------------------------------------------------------------
+
+def handleDaemonClient(pConnection, pLock):
+	"""
+	Run a request from a daemon client, sending back its output and result.
+	Requests are run one at a time, as they share the temporary directory and 
+	the metapackage repository
+	Arguments:
+		pConnection	--	the client connection
+		pLock				--	the lock serialising requests
+	"""
+	try:
+		requestFile = pConnection.makefile("rb")
+		request = json.loads(requestFile.readline().decode("utf-8", "surrogateescape"))
+		requestFile.close()
+		arguments = [str(argument) for argument in request["args"]]
+		inputLines = [str(line) for line in request.get("input", [])]
+	except:
+		debugMsg("Ignoring invalid daemon request")
+		pConnection.close()
+		return
+	with pLock:
+		debugMsg("Running daemon request "+str(arguments[1:]))
+		refreshDependencyMods()
+		try:
+			with contextlib.redirect_stdout(DaemonOutput(pConnection)):
+				returnCode = runAction(arguments, inputLines)
+		except:
+			print("Error: daemon request "+str(arguments[1:])+" failed")
+			returnCode = False
+	try:
+		pConnection.sendall((json.dumps({"result": returnCode})+"\n").encode("utf-8"))
+	except:
+		pass
+	pConnection.close()
+
+# ----------------------------------------------------------------------------
+
+def runDaemon():
+	"""
+	Serve SYNC and LOCAL requests on daemonSocket until terminated, keeping
+	the dependency modifications, groups store and download connections open
+	between requests
+	Returns true if the daemon exited cleanly
+	"""
+	global daemonRunning
+	import signal
+	import socket
+	importDatabaseModules()
+	# Refuse to replace the socket of a running daemon, but remove a stale one
+	if os.path.exists(daemonSocket):
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(daemonSocket)
+			probe.close()
+			print("Error: a daemon is already listening on '"+daemonSocket+"'")
+			return False
+		except OSError:
+			probe.close()
+		try:
+			os.unlink(daemonSocket)
+		except:
+			print("Error: failed to remove stale socket '"+daemonSocket+"'")
+			return False
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	previousUmask = os.umask(0o177)
+	try:
+		server.bind(daemonSocket)
+		os.chmod(daemonSocket, 0o600)
+		server.listen(16)
+	except:
+		os.umask(previousUmask)
+		server.close()
+		print("Error: failed to listen on socket '"+daemonSocket+"'")
+		return False
+	os.umask(previousUmask)
+	signal.signal(signal.SIGTERM, lambda pSignal, pFrame: sys.exit(0))
+	daemonRunning = True
+	lock = threading.Lock()
+	debugMsg("Listening on socket '"+daemonSocket+"'")
+	try:
+		while True:
+			(connection, address) = server.accept()
+			threading.Thread(target=handleDaemonClient, args=(connection, lock), daemon=True).start()
+	except (KeyboardInterrupt, SystemExit):
+		debugMsg("Daemon stopping")
+	finally:
+		server.close()
+		try:
+			os.unlink(daemonSocket)
+		except:
+			pass
+		daemonRunning = False
+		closeGroupsStore(None)
+	return True
+
+# ----------------------------------------------------------------------------
+
+def printUsage():
+	"""
+	Print program usage summary
+	"""
+	print("Usage: PacTrack [--metrics] <ACTION> [ARGUMENTS]\n")
+	print("Possible actions:\n")
+	print("ACTION		ARGUMENTS					DESCRIPTION")
+	print("------		---------					-----------")
+	print("LOCAL		<none>						Process the whole local Pacman database")
+	print("LOCAL		-						Process packages named on stdin in the local Pacman database")
+	print("SYNC			URL, OUTPUTFILE		Download URL to OUTPUTFILE")
+	print("DAEMON		<none>						Serve LOCAL and SYNC actions on "+str(daemonSocket))
+
+# ----------------------------------------------------------------------------
+
+def main(pArgs, pInput, pSocket):
+	"""
+	Main routine, for actions that PacTrack.py has not forwarded to a daemon
+	Arguments:
+		pArgs		--	raw program arguments
+		pInput	--	lines read from standard input, for "LOCAL -"
+		pSocket	--	the daemon's Unix socket
+	"""
+	global daemonSocket
+	daemonSocket = pSocket
+	actionArgs = [arg for arg in pArgs if arg != "--metrics"]
+	if len(actionArgs) > 1 and actionArgs[1].upper() == "DAEMON":
+		return runDaemon()
+	return runAction(pArgs, pInput)